@@ -0,0 +1,223 @@
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from multiprocessing.connection import wait
+from typing import Dict, Iterator, List, Optional
+
+from search_methods.solver import Solver
+
+TESTS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests')
+
+# Algorithms whose result depends on the seed and the beam width
+BEAM_ALGORITHMS = {'Beam_Search'}
+
+FIELDS = ['map', 'algorithm', 'heuristic', 'seed', 'beam_width', 'status', 'time', 'nodes', 'pushes', 'pulls', 'solution_length', 'boxes_on_targets', 'peak_memory_kb', 'profile', 'error']
+
+
+def map_path(map_name: str) -> str:
+    """
+    Returns the path of a map given by name (a file of the tests directory) or by path.
+    """
+    if os.path.exists(map_name):
+        return map_name
+    return os.path.join(TESTS_DIRECTORY, f'{map_name}.yaml')
+
+def make_jobs(maps: List[str], heuristics: List[str], algorithms: List[str], seeds: List[int], beam_widths: List[int]) -> List[Dict]:
+    """
+    Returns one job for every combination. Seeds and beam widths only multiply the runs of Beam Search,
+    the other algorithms are deterministic and don't have a beam.
+    """
+    jobs = []
+    for map_name, algorithm, heuristic in itertools.product(maps, algorithms, heuristics):
+        if algorithm in BEAM_ALGORITHMS:
+            variants = itertools.product(seeds, beam_widths)
+        else:
+            variants = [(None, None)]
+        for seed, beam_width in variants:
+            jobs.append({'map': map_name, 'algorithm': algorithm, 'heuristic': heuristic, 'seed': seed, 'beam_width': beam_width})
+    return jobs
+
+def memory_status_kb(field: str) -> Optional[int]:
+    """
+    Returns a memory field of /proc/self/status (VmRSS, VmHWM...) in KB, None where it can't be read.
+    """
+    try:
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+def reset_peak_memory() -> Optional[int]:
+    """
+    Resets the peak resident memory of the process to its current resident memory and returns it in KB,
+    None where it can't be reset. A job process is forked from the runner and starts with its memory
+    and its peak, which are not the ones of the job.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+    except OSError:
+        return None
+    return memory_status_kb('VmRSS')
+
+def peak_memory_kb(start_kb: Optional[int]) -> Optional[int]:
+    """
+    Returns the peak resident memory of the process in KB over start_kb, its resident memory
+    when reset_peak_memory was called: the memory the job added to the forked runner.
+    None where it can't be measured.
+    """
+    peak_kb = memory_status_kb('VmHWM')
+    if start_kb is None or peak_kb is None:
+        return None
+    return peak_kb - start_kb
+
+def run_job(job: Dict, options: Dict, connection) -> None:
+    """
+    Runs one job in a worker process and sends its record through the connection.
+    The output of the solver is discarded. A search stopped by its budget is 'partial',
+    its record describes the best partial path it returned. nodes counts the nodes the search expanded,
+    read from its budget (0 for a solution found in the solution cache). With the profile option, the record holds the time and calls
+    of every phase of the search (see SearchStats.as_dict).
+    """
+    start_memory_kb = reset_peak_memory()
+    record = dict(job)
+    search_options = dict(options)
+    if job['seed'] is not None:
+        search_options['seed'] = job['seed']
+    if job['beam_width'] is not None:
+        search_options['beam_width'] = job['beam_width']
+    budget = Solver.default_budget(job['algorithm'], search_options.pop('maximum_time'), search_options.pop('max_nodes'), search_options.pop('max_memory'))
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            path, push_count, pull_count, time_taken, stats = Solver().search(job['algorithm'], job['heuristic'], map_path(job['map']), budget=budget, **search_options)
+        if path is None:
+            status = 'failed'
+        else:
+            status = 'solved' if path[-1].is_solved() else 'partial'
+        record.update({
+            'status': status,
+            'time': time_taken,
+            'nodes': budget.nodes,
+            'pushes': push_count,
+            'pulls': pull_count,
+            'solution_length': sum(len(state.moves) for state in path) if path is not None else None,
+            'boxes_on_targets': path[-1].boxes_on_targets() if path is not None else None,
+        })
+        if stats is not None:
+            record['profile'] = stats.as_dict()
+    except Exception as error:
+        record.update({'status': 'error', 'error': repr(error)})
+
+    record['peak_memory_kb'] = peak_memory_kb(start_memory_kb)
+    connection.send(record)
+    connection.close()
+
+def run_jobs(jobs: List[Dict], options: Dict, workers: int, timeout: float) -> Iterator[Dict]:
+    """
+    Runs the jobs, at most workers at a time, each one in a new process so its peak memory
+    is its own and it can be stopped when it runs longer than timeout seconds.
+    Yields the records in the order the runs finish.
+    """
+    pending = deque(jobs)
+    running = {}  # process -> (job, connection, start time)
+
+    while pending or running:
+        while pending and len(running) < workers:
+            job = pending.popleft()
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=run_job, args=(job, options, sender), daemon=True)
+            process.start()
+            sender.close()
+            running[process] = (job, receiver, time.time())
+
+        # wait for a record, the end of a process, or the next timeout
+        next_timeout = min(start + timeout for _, _, start in running.values())
+        waitables = [receiver for _, receiver, _ in running.values()] + [process.sentinel for process in running]
+        wait(waitables, timeout=max(0, next_timeout - time.time()))
+
+        for process, (job, receiver, start) in list(running.items()):
+            record = None
+            if receiver.poll():
+                try:
+                    record = receiver.recv()
+                except EOFError:
+                    pass
+            if record is None and process.is_alive():
+                if time.time() - start < timeout:
+                    continue
+                process.terminate()
+                record = dict(job, status='timeout', time=time.time() - start)
+            elif record is None:
+                record = dict(job, status='error', error=f'worker exited with code {process.exitcode}')
+
+            process.join()
+            receiver.close()
+            del running[process]
+            yield record
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a matrix of Sokoban searches without any interaction.')
+    parser.add_argument('--maps', nargs='+', default=sorted(name[:-len('.yaml')] for name in os.listdir(TESTS_DIRECTORY) if name.endswith('.yaml')), help='map names from the tests directory, or map paths (default: every test map)')
+    parser.add_argument('--heuristics', nargs='+', default=['manhattan_heuristic'])
+    parser.add_argument('--algorithms', nargs='+', default=['Beam_Search'])
+    parser.add_argument('--seeds', nargs='+', type=int, default=[0], help='seeds of Beam Search')
+    parser.add_argument('--beam-widths', nargs='+', type=int, default=[50], help='beam widths of Beam Search')
+    parser.add_argument('--successors', default='moves', choices=['moves', 'pushes'])
+    parser.add_argument('--selection', default='stochastic', help='beam selection policy of Beam Search')
+    parser.add_argument('--prune-dead-squares', action='store_true')
+    parser.add_argument('--prune-deadlocks', action='store_true', help="discard the states with a frozen box, needs --successors pushes")
+    parser.add_argument('--max-time', type=float, help='seconds of the budget of a search, it then returns its best partial path (default: the one of the algorithm)')
+    parser.add_argument('--max-nodes', type=int, help='expanded nodes of the budget of a search')
+    parser.add_argument('--max-memory', type=float, help='resident memory in MB of the budget of a search')
+    parser.add_argument('--profile', action='store_true', help='record the time of every phase of the searches')
+    parser.add_argument('--solution-cache', help='directory of a solution cache shared by the runs, a run solved before returns its cached solution')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='runs at the same time')
+    parser.add_argument('--timeout', type=float, default=300, help='seconds before a run is killed, without a result')
+    parser.add_argument('--output', default='results.jsonl', help='output file, CSV if it ends with .csv, JSON Lines otherwise')
+    arguments = parser.parse_args()
+
+    jobs = make_jobs(arguments.maps, arguments.heuristics, arguments.algorithms, arguments.seeds, arguments.beam_widths)
+    options = {
+        'successors': arguments.successors,
+        'selection': arguments.selection,
+        'prune_dead_squares': arguments.prune_dead_squares,
+        'prune_deadlocks': arguments.prune_deadlocks,
+        'maximum_time': arguments.max_time,
+        'max_nodes': arguments.max_nodes,
+        'max_memory': arguments.max_memory,
+        'profile': arguments.profile,
+        'solution_cache_path': arguments.solution_cache,
+    }
+
+    with open(arguments.output, 'w', newline='') as output:
+        writer = None
+        if arguments.output.endswith('.csv'):
+            writer = csv.DictWriter(output, fieldnames=FIELDS)
+            writer.writeheader()
+
+        for index, record in enumerate(run_jobs(jobs, options, arguments.workers, arguments.timeout), 1):
+            if writer is not None:
+                # CSV cells are flat, the profile is written as JSON
+                if record.get('profile') is not None:
+                    record = dict(record, profile=json.dumps(record['profile']))
+                writer.writerow(record)
+            else:
+                output.write(json.dumps(record) + '\n')
+            # keep the records of a long batch on disk as they come
+            output.flush()
+            print(f"[{index}/{len(jobs)}] {record['map']} {record['algorithm']} {record['heuristic']}: {record['status']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import timeit
+from functools import partial
+from typing import Callable, Dict, Tuple
+
+from sokoban.map import Map
+from sokoban.moves import LEFT, BOX_DOWN
+from sokoban.state import State
+from search_methods import heuristics
+from search_methods.heuristics import Heuristic
+from search_methods.solver import Solver
+
+ROOT_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TESTS_DIRECTORY = os.path.join(ROOT_DIRECTORY, 'tests')
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+HEURISTICS = [
+    'manhattan_heuristic',
+    'euclidian_heuristic',
+    'minimum_euclidian',
+    'minimum_manhattan',
+    'combined_heuristic',
+    'push_distance_heuristic',
+    'matching_heuristic',
+]
+
+# Full searches: (algorithm, heuristic, map name, options), every one of them is deterministic
+MACRO_BENCHMARKS = [
+    ('Beam_Search', 'manhattan_heuristic', 'medium_map2', {}),
+    ('Beam_Search', 'combined_heuristic', 'hard_map2', {}),
+    ('LRTA_star', 'manhattan_heuristic', 'hard_map1', {}),
+    # the trials end in dead ends, every neighbour of some states is learned as a dead end
+    ('LRTA_star', 'manhattan_heuristic', 'medium_map2', {'successors': 'pushes', 'trials': 3, 'prune_dead_squares': True}),
+    ('A_star', 'push_distance_heuristic', 'large_map2', {'successors': 'pushes'}),
+    ('IDA_star', 'push_distance_heuristic', 'hard_map1', {'successors': 'pushes'}),
+    ('Bidirectional_Search', 'manhattan_heuristic', 'large_map2', {}),
+]
+
+
+def calibration_loop() -> int:
+    """
+    Fixed pure Python loop the benchmarks are measured against.
+    """
+    total = 0
+    for index in range(100000):
+        total += index % 7
+    return total
+
+def measure(function: Callable, number: int, repeat: int) -> float:
+    """
+    Returns the time of one call of the function in calibration units: the time of number calls
+    divided by the time of the calibration loop, both measured repeat times, side by side, keeping the best.
+    Measuring them together cancels the changes of speed of the machine, and a baseline recorded
+    on a machine can be checked on a faster or slower one.
+    """
+    calibration_times = []
+    times = []
+    for _ in range(repeat):
+        calibration_times.append(timeit.timeit(calibration_loop, number=1))
+        times.append(timeit.timeit(function, number=number))
+    return min(times) / number / min(calibration_times)
+
+def solve_matching(map: Map) -> int:
+    """
+    Calls matching_heuristic with an empty cache of matchings, so every call solves the matching
+    instead of finding the one of the previous call.
+    """
+    heuristics._matching_solutions.clear()
+    return Heuristic.matching_heuristic(map)
+
+def apply_every_move(state: State) -> list:
+    """
+    Applies every move to the state, the invalid ones included, as the successor generators do.
+    """
+    return [state.apply_move(move) for move in range(LEFT, BOX_DOWN + 1)]
+
+def micro_benchmarks() -> Dict[str, Tuple[Callable, int]]:
+    """
+    Returns the Map operations, the State successor generators the engines run on, and the heuristics
+    on every test map, with the number of calls of a measure.
+    """
+    benchmarks = {}
+    for file_name in sorted(os.listdir(TESTS_DIRECTORY)):
+        if not file_name.endswith('.yaml'):
+            continue
+        map_name = file_name[:-len('.yaml')]
+        map = Map.from_yaml(os.path.join(TESTS_DIRECTORY, file_name))
+
+        functions = {
+            'get_neighbours': map.get_neighbours,
+            'copy': map.copy,
+            'str': map.__str__,
+            'is_solved': map.is_solved,
+        }
+        state = State.from_map(map)
+        functions.update({
+            'state_apply_move': partial(apply_every_move, state),
+            'state_get_neighbours': state.get_neighbours,
+            'state_get_push_neighbours': state.get_push_neighbours,
+        })
+        for heuristic in HEURISTICS:
+            functions[heuristic] = partial(getattr(Heuristic, heuristic), map)
+        functions['matching_heuristic'] = partial(solve_matching, map)
+
+        for name, function in functions.items():
+            # enough calls for at least 0.2 seconds per measure, shorter measures are too noisy
+            number, _ = timeit.Timer(function).autorange()
+            benchmarks[f'{map_name}/{name}'] = (function, number)
+    return benchmarks
+
+def macro_benchmarks() -> Dict[str, Tuple[Callable, int]]:
+    """
+    Returns the full searches of MACRO_BENCHMARKS, measured one call at a time.
+    """
+    solver = Solver()
+    benchmarks = {}
+    for algorithm, heuristic, map_name, options in MACRO_BENCHMARKS:
+        name = '/'.join([algorithm, heuristic, map_name] + [f'{key}={value}' for key, value in options.items()])
+        benchmarks[name] = (partial(solver.run_search_algorithm, algorithm, heuristic, os.path.join(TESTS_DIRECTORY, f'{map_name}.yaml'), **options), 1)
+    return benchmarks
+
+def run_layer(benchmarks: Dict[str, Tuple[Callable, int]], repeat: int) -> Dict[str, float]:
+    """
+    Measures every benchmark of a layer, the output of the searches is discarded.
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        return {name: measure(function, number, repeat) for name, (function, number) in benchmarks.items()}
+
+def compare(layers: Dict, results: Dict, baseline: Dict, tolerance: float, repeat: int, confirm: int) -> int:
+    """
+    Prints every benchmark next to its baseline and returns the number of regressions:
+    benchmarks slower than the baseline by more than tolerance (0.2 is 20%).
+    A benchmark over the tolerance is measured confirm more times and keeps its best score,
+    so a single noisy measure doesn't fail the run.
+    """
+    regressions = 0
+    for layer, benchmarks in layers.items():
+        for name, score in results[layer].items():
+            base_score = baseline.get(layer, {}).get(name)
+            if base_score is None:
+                print(f'{layer:5} {name:60} {score:12.5f}  (not in baseline)')
+                continue
+            for _ in range(confirm):
+                if score <= base_score * (1 + tolerance):
+                    break
+                score = min(score, run_layer({name: benchmarks[name]}, repeat)[name])
+            ratio = score / base_score
+            regression = ratio > 1 + tolerance
+            regressions += regression
+            print(f'{layer:5} {name:60} {score:12.5f}  {ratio:6.2f}x{"  REGRESSION" if regression else ""}')
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the maps, heuristics and searches against the stored baseline. Times are in units of a fixed calibration loop.')
+    parser.add_argument('--layer', choices=['micro', 'macro', 'all'], default='all')
+    parser.add_argument('--repeat', type=int, default=7, help='measures per benchmark, the best one is kept')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed slowdown against the baseline (0.5 is 50%%), above the noise of the measures on a shared machine')
+    parser.add_argument('--confirm', type=int, default=2, help='new measures of a benchmark over the tolerance before it counts as a regression')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--update-baseline', action='store_true', help='store the results as the new baseline')
+    arguments = parser.parse_args()
+
+    layers = {}
+    if arguments.layer in ('micro', 'all'):
+        layers['micro'] = micro_benchmarks()
+    if arguments.layer in ('macro', 'all'):
+        layers['macro'] = macro_benchmarks()
+    results = {layer: run_layer(benchmarks, arguments.repeat) for layer, benchmarks in layers.items()}
+
+    if arguments.update_baseline:
+        baseline = {}
+        if os.path.exists(arguments.baseline):
+            with open(arguments.baseline) as file:
+                baseline = json.load(file)
+        # a partial run only replaces its layers
+        baseline.update(results)
+        with open(arguments.baseline, 'w') as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+            file.write('\n')
+        print(f'Baseline written to {arguments.baseline}')
+        return
+
+    with open(arguments.baseline) as file:
+        baseline = json.load(file)
+    regressions = compare(layers, results, baseline, arguments.tolerance, arguments.repeat, arguments.confirm)
+    if regressions:
+        print(f'{regressions} benchmarks regressed by more than {arguments.tolerance:.0%}')
+        sys.exit(1)
+    print('No regressions')
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,8 @@ from sokoban import (
     Player
 )
 from search_methods.solver import Solver
+import asyncio
+import shutil
 import tkinter as tk
 from tkinter import ttk
 
@@ -27,11 +29,36 @@ heuristics = [
     'minimum_euclidian',
     'minimum_manhattan',
     'combined_heuristic',
+    'push_distance_heuristic',
+    'matching_heuristic',
 ]
 
-algorithms = ['Beam_Search', 'LRTA_star']
+algorithms = ['Beam_Search', 'LRTA_star', 'A_star', 'IDA_star', 'Bidirectional_Search']
 
-def run_beam_search_all_heuristics(given_map_name):
+def print_progress(message):
+    """
+    Show the progress of a search on the current line of the terminal.
+    """
+    width = shutil.get_terminal_size().columns - 1
+    print(message[:width].ljust(width), end='\r', flush=True)
+
+async def run_search(algorithm, heuristic, map_name, show_progress):
+    """
+    Run one search in a worker thread, without blocking the event loop, and show its progress with show_progress.
+    Cancelling the task running the test cancels the search.
+    Returns the number of nodes visited (0 if the search failed) and the time taken.
+    """
+    handle = solver.solve_async(algorithm, heuristic, map_name)
+    try:
+        async for event in handle.events():
+            show_progress(f"{algorithm} with {heuristic} on {map_name}: {event}")
+        show_progress("")
+        return solver.report(algorithm, map_name, *await handle)
+    except asyncio.CancelledError:
+        handle.cancel()
+        raise
+
+async def run_beam_search_all_heuristics(given_map_name, show_progress=print_progress):
     """
     Run the beam search algorithm with all heuristics.
     """
@@ -39,7 +66,7 @@ def run_beam_search_all_heuristics(given_map_name):
     times = []
     for heuristic in heuristics:
         # check if count is 0, then the algorithm failed
-        count, time_taken = solver.run_search_algorithm('Beam_Search', heuristic, given_map_name)
+        count, time_taken = await run_search('Beam_Search', heuristic, given_map_name, show_progress)
         if count == 0:
             print(f"Beam Search with {heuristic} failed on {given_map_name}.")
         counts.append(count)
@@ -47,56 +74,57 @@ def run_beam_search_all_heuristics(given_map_name):
     # plot the results using solver plot_one_alg_multiple_heuristics
     solver.plot_one_alg_multiple_heuristics('Beam_Search', heuristics, counts, times, given_map_name)
 
-def run_lrta_star_all_heuristics(given_map_name):
+async def run_lrta_star_all_heuristics(given_map_name, show_progress=print_progress):
     """
     Run the LRTA* algorithm with all heuristics.
     """
     counts = []
     times = []
     for heuristic in heuristics:
-        count, time_taken = solver.run_search_algorithm('LRTA_star', heuristic, given_map_name)
+        count, time_taken = await run_search('LRTA_star', heuristic, given_map_name, show_progress)
         counts.append(count)
         times.append(time_taken)
     solver.plot_one_alg_multiple_heuristics('LRTA_star', heuristics, counts, times, given_map_name)
 
-def run_beam_search_all_maps(heuristic):
+async def run_beam_search_all_maps(heuristic, show_progress=print_progress):
     """
     Run the beam search algorithm with a specific heuristic and all maps.
     """
     counts = []
     times = []
     for map_name in maps:
-        count, time_taken = solver.run_search_algorithm('Beam_Search', heuristic, maps[map_name])
+        count, time_taken = await run_search('Beam_Search', heuristic, maps[map_name], show_progress)
         if count == 0:
             print(f"Beam Search with {heuristic} failed on {map_name}.")
         counts.append(count)
         times.append(time_taken)
     solver.plot_one_alg_multiple_maps('Beam_Search', heuristic, counts, times, maps.keys())
 
-def run_lrta_star_all_maps(heuristic):
+async def run_lrta_star_all_maps(heuristic, show_progress=print_progress):
     """
     Run the LRTA* algorithm with a specific heuristic and all maps.
     """
     counts = []
     times = []
     for map_name in maps:
-        count, time_taken = solver.run_search_algorithm('LRTA_star', heuristic, maps[map_name])
+        count, time_taken = await run_search('LRTA_star', heuristic, maps[map_name], show_progress)
         if count == 0:
             print(f"LRTA* with {heuristic} failed on {map_name}.")
         counts.append(count)
         times.append(time_taken)
     solver.plot_one_alg_multiple_maps('LRTA_star', heuristic, counts, times, maps.keys())
 
-def run_specific_test(map_name, heuristic, algorithm):
+async def run_specific_test(map_name, heuristic, algorithm, show_progress=print_progress):
     """
     Run a specific test with the given map name, heuristic and algorithm.
     """
-    count, time_taken = solver.run_search_algorithm(algorithm, heuristic, maps[map_name])
+    count, time_taken = await run_search(algorithm, heuristic, maps[map_name], show_progress)
     solver.plot_one_alg_one_map_one_heuristic(algorithm, heuristic, count, time_taken, map_name)
 
-def open_specific_test_window(root):
+def open_specific_test_window(root, start_test, show_progress):
     """
     Open a new window to select the specific test parameters.
+    The test is started with start_test and shows its progress with show_progress.
     """
     # create a new window
     specific_test_window = tk.Toplevel(root)
@@ -134,13 +162,44 @@ def open_specific_test_window(root):
     algorithm_combobox.current(0)
 
     # create a button to run the test
-    run_button = tk.Button(specific_test_window, text="Run Test", command=lambda: run_specific_test(map_combobox.get(), heuristic_combobox.get(), algorithm_combobox.get()))
+    run_button = tk.Button(specific_test_window, text="Run Test", command=lambda: start_test(run_specific_test(map_combobox.get(), heuristic_combobox.get(), algorithm_combobox.get(), show_progress)))
     run_button.pack(pady=20)
 
 def use_graphic_interface():
     """
     Create a graphic interface to run the tests.
+    The tests run as asyncio tasks, the searches in worker threads, so the window stays responsive
+    and the running test can be cancelled.
     """
+    # the asyncio event loop runs between the tkinter events (see run_event_loop)
+    loop = asyncio.new_event_loop()
+    current_test = None
+    window_closed = False
+
+    def show_progress(message):
+        # the cancelled test still reports its end once the window is gone
+        if not window_closed:
+            status_label.config(text=message)
+
+    def start_test(test):
+        nonlocal current_test
+        if current_test is not None and not current_test.done():
+            test.close()
+            show_progress("A test is already running, cancel it first")
+            return
+        current_test = loop.create_task(test)
+        current_test.add_done_callback(lambda task: show_progress("Test cancelled" if task.cancelled() else "Test finished"))
+
+    def cancel_test():
+        if current_test is not None:
+            current_test.cancel()
+
+    def run_event_loop():
+        # run the ready callbacks of the event loop, then give the control back to tkinter
+        loop.call_soon(loop.stop)
+        loop.run_forever()
+        root.after(50, run_event_loop)
+
     def run_beam_search_all_heuristics_selected_map():
         # create a new window to select the map
         map_window = tk.Toplevel(root)
@@ -156,7 +215,7 @@ def use_graphic_interface():
         # preselect the first map
         map_combobox.current(0)
         # create a button to run the test
-        run_button = tk.Button(map_window, text="Run Test", command=lambda: [run_beam_search_all_heuristics(maps[map_combobox.get()]), map_window.destroy()])
+        run_button = tk.Button(map_window, text="Run Test", command=lambda: [start_test(run_beam_search_all_heuristics(maps[map_combobox.get()], show_progress)), map_window.destroy()])
         run_button.pack(pady=20)
         # close the window when the test is done
         map_window.protocol("WM_DELETE_WINDOW", lambda: map_window.destroy())
@@ -176,7 +235,7 @@ def use_graphic_interface():
         # preselect the first map
         map_combobox.current(0)
         # create a button to run the test
-        run_button = tk.Button(map_window, text="Run Test", command=lambda: [run_lrta_star_all_heuristics(maps[map_combobox.get()]), map_window.destroy()])
+        run_button = tk.Button(map_window, text="Run Test", command=lambda: [start_test(run_lrta_star_all_heuristics(maps[map_combobox.get()], show_progress)), map_window.destroy()])
         run_button.pack(pady=20)
         # close the window when the test is done
         map_window.protocol("WM_DELETE_WINDOW", lambda: map_window.destroy())
@@ -196,7 +255,7 @@ def use_graphic_interface():
         # preselect the first heuristic
         heuristic_combobox.current(0)
         # create a button to run the test
-        run_button = tk.Button(heuristic_window, text="Run Test", command=lambda: [run_beam_search_all_maps(heuristic_combobox.get()), heuristic_window.destroy()])
+        run_button = tk.Button(heuristic_window, text="Run Test", command=lambda: [start_test(run_beam_search_all_maps(heuristic_combobox.get(), show_progress)), heuristic_window.destroy()])
         run_button.pack(pady=20)
         # close the window when the test is done
         heuristic_window.protocol("WM_DELETE_WINDOW", lambda: heuristic_window.destroy())
@@ -216,7 +275,7 @@ def use_graphic_interface():
         # preselect the first heuristic
         heuristic_combobox.current(0)
         # create a button to run the test
-        run_button = tk.Button(heuristic_window, text="Run Test", command=lambda: [run_lrta_star_all_maps(heuristic_combobox.get()), heuristic_window.destroy()])
+        run_button = tk.Button(heuristic_window, text="Run Test", command=lambda: [start_test(run_lrta_star_all_maps(heuristic_combobox.get(), show_progress)), heuristic_window.destroy()])
         run_button.pack(pady=20)
         # close the window when the test is done
         heuristic_window.protocol("WM_DELETE_WINDOW", lambda: heuristic_window.destroy())
@@ -246,11 +305,17 @@ def use_graphic_interface():
     lrta_star_all_maps_button = tk.Button(button_frame, text="Run LRTA* with given heuristic on all maps", command=run_lrta_star_with_heuristic, width=60, height=2, bg="#4CAF50", fg="white", font=("Arial", 14))
     lrta_star_all_maps_button.pack(pady=5)
     # create a button for the specific test
-    specific_test_button = tk.Button(button_frame, text="Run specific test", command=lambda: open_specific_test_window(root), width=60, height=2, bg="#4CAF50", fg="white", font=("Arial", 14))
+    specific_test_button = tk.Button(button_frame, text="Run specific test", command=lambda: open_specific_test_window(root, start_test, show_progress), width=60, height=2, bg="#4CAF50", fg="white", font=("Arial", 14))
     specific_test_button.pack(pady=5)
+    # create a button to cancel the running test
+    cancel_button = tk.Button(button_frame, text="Cancel running test", command=cancel_test, width=60, height=2, bg="#FF9800", fg="white", font=("Arial", 14))
+    cancel_button.pack(pady=5)
     # create close button
     close_button = tk.Button(button_frame, text="Close", command=root.quit, width=60, height=2, bg="#f44336", fg="white", font=("Arial", 14))
     close_button.pack(pady=5)
+    # create a label for the progress of the running test
+    status_label = tk.Label(root, text="", font=("Arial", 11), bg="#f0f0f0")
+    status_label.pack(pady=5)
 
     # if the window is closed, close all plots
     def on_closing():
@@ -258,11 +323,21 @@ def use_graphic_interface():
         root.destroy()
     
     root.protocol("WM_DELETE_WINDOW", on_closing)
+    root.after(50, run_event_loop)
     root.mainloop()
+    window_closed = True
+
+    # stop the running test and wait for its search to return
+    cancel_test()
+    if current_test is not None:
+        loop.run_until_complete(asyncio.gather(current_test, return_exceptions=True))
+    loop.run_until_complete(loop.shutdown_default_executor())
+    loop.close()
     
 def use_terminal_interface():
     """
     Create a terminal interface to run the tests.
+    The test shows the progress of its searches, Ctrl+C cancels it.
     """
     # read from input what tests to do
     print("1. Run beam search with all heuristics on given map")
@@ -271,6 +346,7 @@ def use_terminal_interface():
     print("4. Run LRTA* with given heuristic on all maps")
     print("5. Run specific algorithm, specific map, specific heuristic")
     number = input("Enter the number of the test you want to run: ")
+    test = None
     if number == '1':
         # print all map names
         print("Available maps:")
@@ -280,7 +356,7 @@ def use_terminal_interface():
         map_name = input("Enter the name of the map: ")
         while (map_name not in maps):
             map_name = input("Invalid map name. Try again: ")
-        run_beam_search_all_heuristics(maps[map_name])
+        test = run_beam_search_all_heuristics(maps[map_name])
     elif number == '2':
         # print all map names
         print("Available maps:")
@@ -290,7 +366,7 @@ def use_terminal_interface():
         map_name = input("Enter the name of the map: ")
         while (map_name not in maps):
             map_name = input("Invalid map name. Try again: ")
-        run_lrta_star_all_heuristics(maps[map_name])
+        test = run_lrta_star_all_heuristics(maps[map_name])
     elif number == '3':
         # print all heuristics
         print("Available heuristics:")
@@ -300,7 +376,7 @@ def use_terminal_interface():
         heuristic = input("Enter the heuristic to use: ")
         while (heuristic not in heuristics):
             heuristic = input("Invalid heuristic. Try again: ")
-        run_beam_search_all_maps(heuristic)
+        test = run_beam_search_all_maps(heuristic)
     elif number == '4':
         # print all heuristics
         print("Available heuristics:")
@@ -310,7 +386,7 @@ def use_terminal_interface():
         heuristic = input("Enter the heuristic to use: ")
         while (heuristic not in heuristics):
             heuristic = input("Invalid heuristic. Try again: ")
-        run_lrta_star_all_maps(heuristic)
+        test = run_lrta_star_all_maps(heuristic)
     elif number == '5':
         # print all map names
         print("Available maps:")
@@ -333,10 +409,16 @@ def use_terminal_interface():
         algorithm = input("Enter the name of the algorithm: ")
         while (algorithm not in algorithms):
             algorithm = input("Invalid algorithm name. Try again: ")
-        run_specific_test(map_name, heuristic, algorithm)
+        test = run_specific_test(map_name, heuristic, algorithm)
     else:
         print("Invalid input. Please enter a number between 1 and 6.")
 
+    if test is not None:
+        try:
+            asyncio.run(test)
+        except KeyboardInterrupt:
+            print("\nTest cancelled.")
+
     # wait for enter key to exit
     input("Press enter to exit...")
 
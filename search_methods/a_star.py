@@ -0,0 +1,116 @@
+import heapq
+from typing import List, Optional, Tuple, Callable
+from sokoban.map import Map
+from sokoban.state import State, SUCCESSOR_GENERATORS
+from search_methods.deadlocks import check_deadlock_pruning, creates_deadlock
+from search_methods.beam_search import rebuild_path
+from search_methods.search_stats import SearchStats
+from search_methods.budget import Budget, progress
+
+
+class A_star:
+    """
+    A* algorithm for Sokoban.
+    """
+    @staticmethod
+    def A_star(initial_map: Map, heuristic: Callable[[State], int], prune_dead_squares: bool = False, prune_deadlocks: bool = False, successors: str = 'moves', max_states: int = 2000000, stats: Optional[SearchStats] = None, budget: Optional[Budget] = None) -> Tuple[List[State], int, int]:
+        """
+        A* algorithm for Sokoban.
+        The cost of a path is its number of player moves, so with 'pushes' successors a step costs
+        the walk plus the push. The path is the shortest one when the heuristic is admissible.
+        The open list is a bucket queue keyed by the integer f = g + h, a bucket is a stack, so among the
+        nodes with the same f the last generated (deepest) is expanded first. The buckets are in a dict and
+        their f values in a heap: a state with a huge h (UNREACHABLE boxes) costs one bucket, not one per f below it. States are never compared,
+        the table of the best costs found is keyed by their Zobrist hash.
+        The search gives up when more than max_states states are known, which bounds its memory.
+        With prune_dead_squares, pushes of a box on a dead square of the level are not generated.
+        With prune_deadlocks, neighbours where the moved box is in a freeze deadlock are discarded,
+        it needs 'pushes' successors (see check_deadlock_pruning).
+        successors selects the successor generator: 'moves' for single moves, 'pushes' for whole box pushes.
+        stats, a SearchStats, times the phases of the search.
+        budget limits the time, expanded nodes and memory of the search (120 seconds by default),
+        when it runs out the path to the best state expanded so far is returned (see progress).
+        """
+        if prune_deadlocks:
+            check_deadlock_pruning(successors)
+        get_neighbours = SUCCESSOR_GENERATORS[successors]
+        is_solved = State.is_solved
+        if budget is None:
+            budget = Budget(max_time=120)
+        start_state = State.from_map(initial_map)
+
+        best_costs = {start_state.zobrist: 0}  # lowest cost found for every known state
+        if stats is not None:
+            get_neighbours = stats.timed(SearchStats.MOVE_GENERATION, get_neighbours)
+            is_solved = stats.timed(SearchStats.GOAL_TEST, is_solved)
+            heuristic = stats.timed(SearchStats.HEURISTIC, heuristic)
+            best_costs = stats.timed_lookups(SearchStats.DUPLICATE_CHECK, best_costs)
+
+        lowest_f = int(heuristic(start_state))
+        buckets = {lowest_f: [(0, (start_state, None))]}  # buckets[f] holds the (g, node) entries with that f, node: (state, parent node)
+        bucket_fs = [lowest_f]  # heap of the f values of the buckets
+        open_count = 1
+        best_score, best_node = progress(start_state, lowest_f), (start_state, None)
+        budget.best_h = lowest_f
+
+        while open_count:
+            # stop when the budget runs out
+            if budget.exceeded():
+                return A_star.partial_result(best_node)
+
+            # pop from the lowest non-empty bucket, the empty ones are dropped
+            while not buckets[bucket_fs[0]]:
+                del buckets[heapq.heappop(bucket_fs)]
+            lowest_f = bucket_fs[0]
+            cost, node = buckets[lowest_f].pop()
+            open_count -= 1
+            state = node[0]
+
+            # skip entries superseded by a cheaper path to the same state
+            if cost > best_costs[state.zobrist]:
+                continue
+
+            if is_solved(state):
+                path = rebuild_path(node)
+                return path, sum(step.push_count for step in path), sum(step.pull_count for step in path)
+
+            # keep the most advanced state, the nodes of a bucket have f = lowest_f
+            h = lowest_f - cost
+            if h <= best_score[0]:
+                score = progress(state, h)
+                if score < best_score:
+                    best_score, best_node = score, node
+                    budget.best_h = h
+
+            budget.nodes += 1
+            budget.frontier = open_count
+            for neighbour in get_neighbours(state, prune_dead_squares):
+                if prune_deadlocks and creates_deadlock(neighbour):
+                    continue
+
+                new_cost = cost + len(neighbour.moves)
+                known_cost = best_costs.get(neighbour.zobrist)
+                if known_cost is not None and known_cost <= new_cost:
+                    continue
+                if known_cost is None and len(best_costs) >= max_states:
+                    return A_star.partial_result(best_node)  # out of memory budget
+                best_costs[neighbour.zobrist] = new_cost
+
+                f = new_cost + int(heuristic(neighbour))
+                bucket = buckets.get(f)
+                if bucket is None:
+                    # an inconsistent heuristic can give a lower f than the current one, the heap orders them anyway
+                    bucket = buckets[f] = []
+                    heapq.heappush(bucket_fs, f)
+                bucket.append((new_cost, (neighbour, node)))
+                open_count += 1
+
+        return None, 0, 0  # no solution found
+
+    @staticmethod
+    def partial_result(node: Tuple) -> Tuple[List[State], int, int]:
+        """
+        Returns the path to the node, with its pushes and pulls, for a search stopped before the goal.
+        """
+        path = rebuild_path(node)
+        return path, sum(step.push_count for step in path), sum(step.pull_count for step in path)
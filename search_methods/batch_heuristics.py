@@ -0,0 +1,106 @@
+import numpy as np
+from typing import List, Tuple
+from sokoban.level import Level
+from sokoban.state import State
+from search_methods.deadlocks import is_freeze_deadlock
+
+
+def encode_states(states: List[State]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Encodes the states for the batch heuristics.
+    Returns the (x, y) coordinates of the boxes, shaped (N, boxes, 2), and of the players, shaped (N, 2).
+    """
+    width = states[0].level.width
+    box_cells = np.array([state.boxes for state in states], dtype=np.int64)
+    player_cells = np.array([state.player for state in states], dtype=np.int64)
+    boxes = np.stack(np.divmod(box_cells, width), axis=-1)
+    players = np.stack(np.divmod(player_cells, width), axis=-1)
+    return boxes, players
+
+
+class BatchHeuristic:
+    """
+    Vectorized heuristics, scoring N states in one call.
+    Each one takes the level and the encoded boxes and players (see encode_states)
+    and returns the N scores, equal to the ones of the matching Heuristic function.
+    """
+    @staticmethod
+    def manhattan_heuristic(level: Level, boxes: np.ndarray, players: np.ndarray) -> np.ndarray:
+        """
+        Sum of the Manhattan distances between every box and every target,
+        gathered from the per-cell sums of the level.
+        """
+        manhattan_sums = np.frombuffer(level.manhattan_sums, dtype=np.int32)
+        return manhattan_sums[boxes[:, :, 0] * level.width + boxes[:, :, 1]].sum(axis=1)
+
+    @staticmethod
+    def euclidian_heuristic(level: Level, boxes: np.ndarray, players: np.ndarray) -> np.ndarray:
+        """
+        Sum of the Euclidean distances between every box and every target,
+        gathered from the per-cell sums of the level.
+        """
+        euclidian_sums = np.frombuffer(level.euclidian_sums, dtype=np.float64)
+        return euclidian_sums[boxes[:, :, 0] * level.width + boxes[:, :, 1]].sum(axis=1)
+
+    @staticmethod
+    def combined_heuristic(level: Level, boxes: np.ndarray, players: np.ndarray) -> np.ndarray:
+        """
+        Vectorized Heuristic.combined_heuristic:
+        Manhattan distances, penalties for blocked boxes and frozen boxes, and the distance to the closest box.
+        """
+        blocked_penalty = 50
+        blocking_penalty = 50
+        player_distance_weight = 3
+
+        count = boxes.shape[0]
+        box_x = boxes[:, :, 0]
+        box_y = boxes[:, :, 1]
+        total_distance = BatchHeuristic.manhattan_heuristic(level, boxes, players)
+
+        # Grids padded with one cell on every side, so the neighbours of the border cells can be indexed
+        padded_x = box_x + 1
+        padded_y = box_y + 1
+        obstacles = np.zeros((level.length + 2, level.width + 2), dtype=bool)
+        for x, y in level.obstacles:
+            obstacles[x + 1, y + 1] = True
+        targets = np.zeros((level.length + 2, level.width + 2), dtype=bool)
+        for x, y in level.targets:
+            targets[x + 1, y + 1] = True
+        dead_squares = np.zeros((level.length + 2, level.width + 2), dtype=bool)
+        dead_squares[1:-1, 1:-1] = np.frombuffer(level.dead_squares, dtype=np.uint8).reshape(level.length, level.width).astype(bool)
+
+        # Blocked boxes: on a dead square, or between two obstacles while not on a target
+        between_obstacles = ((obstacles[padded_x - 1, padded_y] & obstacles[padded_x + 1, padded_y])
+                             | (obstacles[padded_x, padded_y - 1] & obstacles[padded_x, padded_y + 1]))
+        blocked = dead_squares[padded_x, padded_y] | (between_obstacles & ~targets[padded_x, padded_y])
+        total_distance = total_distance + blocked_penalty * blocked.sum(axis=1)
+
+        # Frozen boxes: a box can only be frozen if, on both axes, it touches a wall (or the edge of the map),
+        # another box, or has dead squares on both sides. Only those candidates are checked one by one.
+        occupied = np.zeros((count, level.length + 2, level.width + 2), dtype=bool)
+        occupied[np.arange(count)[:, None], padded_x, padded_y] = True
+        walls = np.ones((level.length + 2, level.width + 2), dtype=bool)
+        walls[1:-1, 1:-1] = obstacles[1:-1, 1:-1]
+        states = np.arange(count)[:, None]
+
+        def axis_candidate(first, second):
+            first_x, first_y = first
+            second_x, second_y = second
+            return (walls[first_x, first_y] | walls[second_x, second_y]
+                    | occupied[states, first_x, first_y] | occupied[states, second_x, second_y]
+                    | (dead_squares[first_x, first_y] & dead_squares[second_x, second_y]))
+
+        candidates = (axis_candidate((padded_x, padded_y - 1), (padded_x, padded_y + 1))
+                      & axis_candidate((padded_x - 1, padded_y), (padded_x + 1, padded_y)))
+        cells = (box_x * level.width + box_y).tolist()
+        box_sets = {}
+        state_indices, box_indices = np.nonzero(candidates)
+        for state_index, box_index in zip(state_indices.tolist(), box_indices.tolist()):
+            if state_index not in box_sets:
+                box_sets[state_index] = set(cells[state_index])
+            if is_freeze_deadlock(level, box_sets[state_index], cells[state_index][box_index]):
+                total_distance[state_index] += blocking_penalty
+
+        # Distance between the player and the closest box
+        player_distances = np.abs(boxes - players[:, None, :]).sum(axis=-1).min(axis=1)
+        return total_distance + player_distance_weight * player_distances
@@ -1,63 +1,418 @@
+import heapq
 import random
-from typing import Callable, List, Tuple
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from multiprocessing import Value
+from typing import Callable, List, Optional, Tuple
+from sokoban.level import Level
 from sokoban.map import Map
-import random
+from sokoban.state import State, SUCCESSOR_GENERATORS
+from search_methods.deadlocks import check_deadlock_pruning, creates_deadlock
+from search_methods.search_stats import SearchStats
+from search_methods.budget import Budget, progress, PROGRESS_INTERVAL
 
 # Source: https://medium.com/biased-algorithms/introduction-to-beam-search-algorithm-d598a77a4b4d
 
-def beam_search(start_node: Map, beam_width: int, heuristic: Callable[[Map], int], max_restarts: int = 10000, max_iterations: int = 10000) -> Tuple[List[Map], int, int]:
+# Lowest restart that found a solution, shared with the worker processes of a parallel search
+_solved_restart = None
+
+# Nodes expanded by all the restarts of a parallel search, and whether its budget ran out (or it was cancelled)
+_shared_nodes = None
+_stopped = None
+
+# Search settings of an expansion worker process: level, heuristic, successor generator, pruning and batch heuristic
+_expansion = None
+
+# Beams smaller than this are expanded in the main process, sending them to the workers costs more than it saves
+MIN_PARALLEL_BEAM = 64
+
+# Share of the beam the hybrid selection fills with the best successors, the rest is sampled
+ELITE_FRACTION = 0.25
+
+
+def rebuild_path(node: Tuple) -> List[State]:
     """
-    Beam Search algorithm for Sokoban with stochasticity and restart mechanism.
+    Rebuilds the path from the start state to the state of a beam node.
+    Beam nodes are (state, parent node) pairs, the start node has None as parent,
+    the moves applied between them are kept in state.moves.
     """
-    random.seed(0)  # seed for reproducibility
-    restart_count = 0
+    path = []
+    while node is not None:
+        state, node = node
+        path.append(state)
+    path.reverse()
+    return path
 
-    import time
-    start_time = time.time()
-    # set maximum time for the search
-    maximum_time = 120
-    import time
-    while time.time() - start_time < maximum_time:
-        # beam with the start node
-        beam = [(start_node, [start_node])]  # (current state, path to state)
-        visited_states = set()
-        iteration_count = 0
-        total_pushes = 0
-        total_pulls = 0
-
-        while beam:
+def restart_seed(seed: int, restart: int) -> str:
+    """
+    Returns the seed of one restart, derived from the base seed.
+    A restart explores the same states whether it runs alone or in a worker process.
+    """
+    return f'{seed}-{restart}'
+
+def select_stochastic(generator: random.Random, next_beam: List[Tuple], weights: List[float], beam_width: int, elite_fraction: float) -> List[Tuple]:
+    """
+    Samples the next beam with replacement, proportionally to the weights.
+    A good successor can fill several slots of the beam.
+    """
+    return generator.choices(next_beam, weights=weights, k=min(beam_width, len(next_beam)))
+
+def select_top_k(generator: random.Random, next_beam: List[Tuple], weights: List[float], beam_width: int, elite_fraction: float) -> List[Tuple]:
+    """
+    Keeps the beam_width successors with the highest weights (lowest heuristic), earlier successors win ties.
+    """
+    best = heapq.nlargest(beam_width, range(len(next_beam)), key=weights.__getitem__)
+    return [next_beam[index] for index in best]
+
+def select_without_replacement(generator: random.Random, next_beam: List[Tuple], weights: List[float], beam_width: int, elite_fraction: float) -> List[Tuple]:
+    """
+    Samples beam_width distinct successors, proportionally to the weights.
+    Each successor gets the key u ** (1 / weight), u uniform in [0, 1), and the largest keys are kept
+    (Efraimidis and Spirakis, Weighted random sampling with a reservoir).
+    """
+    keys = [generator.random() ** (1 / weight) for weight in weights]
+    chosen = heapq.nlargest(beam_width, range(len(next_beam)), key=keys.__getitem__)
+    return [next_beam[index] for index in chosen]
+
+def select_hybrid(generator: random.Random, next_beam: List[Tuple], weights: List[float], beam_width: int, elite_fraction: float) -> List[Tuple]:
+    """
+    Keeps the best elite_fraction of the beam, like select_top_k,
+    and samples the rest of the beam from the other successors, like select_without_replacement.
+    """
+    elite_size = min(int(beam_width * elite_fraction), len(next_beam))
+    elite = set(heapq.nlargest(elite_size, range(len(next_beam)), key=weights.__getitem__))
+    others = [index for index in range(len(next_beam)) if index not in elite]
+    keys = {index: generator.random() ** (1 / weights[index]) for index in others}
+    sampled = heapq.nlargest(beam_width - elite_size, others, key=keys.__getitem__)
+    return [next_beam[index] for index in sorted(elite)] + [next_beam[index] for index in sampled]
+
+# Policies choosing the next beam among the weighted successors
+SELECTION_POLICIES = {
+    'stochastic': select_stochastic,
+    'top_k': select_top_k,
+    'without_replacement': select_without_replacement,
+    'hybrid': select_hybrid,
+}
+
+def _init_expansion_worker(level: Level, heuristic: Callable[[State], int], prune_dead_squares: bool, prune_deadlocks: bool, successors: str, batch_heuristic: Optional[Callable]) -> None:
+    """
+    Initializer of the expansion worker processes, the level and the search settings are sent only once.
+    """
+    global _expansion
+    _expansion = (level, heuristic, SUCCESSOR_GENERATORS[successors], prune_dead_squares, prune_deadlocks, batch_heuristic)
+
+def _expand_chunk(encoded_states: List[Tuple]) -> List[Tuple]:
+    """
+    Expands a slice of the beam in an expansion worker and scores the successors.
+    States come in and go out as tuples of ints, which pickle much faster than State objects:
+    (beam index, player, boxes, zobrist) in, (beam index, player, boxes, zobrist, push count, pull count, moved box, moves, score) out.
+    Duplicates inside the slice are dropped in order, the ones against visited_states are dropped by the main process.
+    """
+    level, heuristic, get_neighbours, prune_dead_squares, prune_deadlocks, batch_heuristic = _expansion
+    seen = set()
+    expanded = []
+    for index, player, boxes, zobrist in encoded_states:
+        state = State(level, player, boxes, zobrist=zobrist)
+        for successor in get_neighbours(state, prune_dead_squares):
+            if prune_deadlocks and creates_deadlock(successor):
+                continue
+            if successor.zobrist not in seen:
+                seen.add(successor.zobrist)
+                expanded.append((index, successor))
+
+    if not expanded:
+        return []
+    if batch_heuristic is not None:
+        from search_methods.batch_heuristics import encode_states
+        scores = batch_heuristic(level, *encode_states([successor for _, successor in expanded])).tolist()
+    else:
+        scores = [heuristic(successor) for _, successor in expanded]
+
+    return [(index, successor.player, successor.boxes, successor.zobrist, successor.push_count, successor.pull_count, successor.moved_box, successor.moves, score)
+            for (index, successor), score in zip(expanded, scores)]
+
+def _parallel_expansion(expansion_pool: ProcessPoolExecutor, expansion_workers: int, beam: List[Tuple], visited_states: set) -> Tuple[List[Tuple], List[float], int, int]:
+    """
+    Expands the beam in the expansion workers, one contiguous slice each, and merges the results in beam order.
+    The next beam, the weights, and the pushes and pulls are the same as the ones of a sequential expansion.
+    """
+    level = beam[0][0].level
+    encoded_beam = [(index, node.player, node.boxes, node.zobrist) for index, (node, _) in enumerate(beam)]
+    chunk_size = -(-len(encoded_beam) // expansion_workers)
+    chunks = [encoded_beam[start:start + chunk_size] for start in range(0, len(encoded_beam), chunk_size)]
+
+    next_beam = []
+    weights = []
+    total_pushes = 0
+    total_pulls = 0
+    for expanded in expansion_pool.map(_expand_chunk, chunks):
+        for index, player, boxes, zobrist, push_count, pull_count, moved_box, moves, score in expanded:
+            if zobrist in visited_states:  # avoid revisiting states
+                continue
+            visited_states.add(zobrist)
+            successor = State(level, player, boxes, push_count, pull_count, zobrist, moved_box, moves)
+            next_beam.append((successor, beam[index]))
+            weights.append(1 / (1 + score))  # inverse proportional to heuristic
+            total_pushes += push_count
+            total_pulls += pull_count
+
+    return next_beam, weights, total_pushes, total_pulls
+
+def beam_search_restart(start_state: State, beam_width: int, heuristic: Callable[[State], int], restart: int, seed: int, max_iterations: int, budget: Budget, prune_dead_squares: bool, prune_deadlocks: bool, successors: str, batch_heuristic: Optional[Callable], selection: str = 'stochastic', elite_fraction: float = ELITE_FRACTION, expansion_pool: Optional[ProcessPoolExecutor] = None, expansion_workers: int = 1, stats: Optional[SearchStats] = None) -> Tuple[List[State], int, int]:
+    """
+    One stochastic restart of Beam Search, from the start state.
+    The next beam is chosen by the selection policy (see SELECTION_POLICIES).
+    Stops when the budget runs out, after max_iterations, or when a parallel search
+    already solved the level with an earlier restart. In a worker process of a parallel search, the nodes
+    are added to the ones of the whole search after every beam, and the budget stops when the search is stopped. Without a solution, the path returned
+    leads to the best state of the beams (see progress), the caller checks whether its last state is solved.
+    With an expansion_pool, large beams are expanded and scored by the expansion_workers.
+    With stats, the phases run in this process are timed (see SearchStats).
+    """
+    get_neighbours = SUCCESSOR_GENERATORS[successors]
+    is_solved = State.is_solved
+    select = SELECTION_POLICIES[selection]
+    if batch_heuristic is not None:
+        from search_methods.batch_heuristics import encode_states
+    generator = random.Random(restart_seed(seed, restart))
+
+    # beam with the start node
+    beam = [(start_state, None)]  # (current state, parent node)
+    visited_states = set()
+
+    if stats is not None:
+        get_neighbours = stats.timed(SearchStats.MOVE_GENERATION, get_neighbours)
+        is_solved = stats.timed(SearchStats.GOAL_TEST, is_solved)
+        heuristic = stats.timed(SearchStats.HEURISTIC, heuristic)
+        if batch_heuristic is not None:
+            batch_heuristic = stats.timed(SearchStats.HEURISTIC, batch_heuristic)
+        visited_states = stats.timed_lookups(SearchStats.DUPLICATE_CHECK, visited_states)
+    iteration_count = 0
+    total_pushes = 0
+    total_pulls = 0
+    best_score, best_node = progress(start_state, heuristic(start_state)), beam[0]
+    counted_nodes = budget.nodes
+
+    while beam:
+        counted_nodes = _share_nodes(budget, counted_nodes)
+
+        # stop if the budget ran out or an earlier restart found a solution
+        if budget.exceeded():
+            break
+        if _solved_restart is not None and _solved_restart.value < restart:
+            break
+
+        # a beam holding the goal is explored in order, to stop at the goal node
+        weights = None
+        if expansion_pool is not None and len(beam) >= MIN_PARALLEL_BEAM and not any(is_solved(node) for node, _ in beam):
+            next_beam, weights, pushes, pulls = _parallel_expansion(expansion_pool, expansion_workers, beam, visited_states)
+            budget.nodes += len(beam)
+            total_pushes += pushes
+            total_pulls += pulls
+        else:
             next_beam = []
 
             # explore each node in the current beam
-            for node, path in beam:
+            for beam_node in beam:
+                node = beam_node[0]
                 # check if the goal is reached
-                if node.is_solved():
-                    return path, total_pushes, total_pulls  # goal is reached
-                
+                if is_solved(node):
+                    _share_nodes(budget, counted_nodes)
+                    return rebuild_path(beam_node), total_pushes, total_pulls  # goal is reached
+
+                budget.nodes += 1  # the node is expanded
                 # Generate successors (neighbors) and add them to the next beam
-                for successor in node.get_neighbours():
-                    state_str = str(successor)
-                    if state_str not in visited_states:  # avoid revisiting states
-                        visited_states.add(state_str)
-                        next_beam.append((successor, path + [successor]))
+                for successor in get_neighbours(node, prune_dead_squares):
+                    if prune_deadlocks and creates_deadlock(successor):
+                        continue
+
+                    state_key = successor.zobrist
+                    if state_key not in visited_states:  # avoid revisiting states
+                        visited_states.add(state_key)
+                        next_beam.append((successor, beam_node))
 
                         # Count pushes and pulls
                         total_pushes += successor.push_count
                         total_pulls += successor.pull_count
 
-            # stochasticity: select successors probabilistically based on heuristic
-            if next_beam:
+        # stochasticity: select successors probabilistically based on heuristic
+        if next_beam:
+            # the expansion workers already scored the successors they generated
+            if weights is None and batch_heuristic is not None:
+                scores = batch_heuristic(start_state.level, *encode_states([x[0] for x in next_beam]))
+                weights = (1 / (1 + scores)).tolist()
+            elif weights is None:
                 weights = [1 / (1 + heuristic(x[0])) for x in next_beam]  # inverse proportional to heuristic
-                beam = random.choices(next_beam, weights=weights, k=min(beam_width, len(next_beam)))
-            else:
-                beam = []
 
-            iteration_count += 1
-            if iteration_count >= max_iterations:
-                # if no solution is found in this iteration, break and restart
+            # keep the most advanced successor, the one with the highest weight (lowest heuristic)
+            index = max(range(len(weights)), key=weights.__getitem__)
+            h = 1 / weights[index] - 1
+            if h <= best_score[0]:
+                score = progress(next_beam[index][0], h)
+                if score < best_score:
+                    best_score, best_node = score, next_beam[index]
+                    # the best state of every restart is kept, the best heuristic of the whole search is reported
+                    if budget.best_h is None or h < budget.best_h:
+                        budget.best_h = h
+            beam = select(generator, next_beam, weights, beam_width, elite_fraction)
+            budget.frontier = len(beam)
+        else:
+            beam = []
+
+        iteration_count += 1
+        if iteration_count >= max_iterations:
+            # if no solution is found in this iteration, break and restart
+            break
+
+    _share_nodes(budget, counted_nodes)
+    return rebuild_path(best_node), total_pushes, total_pulls  # no solution found, best partial path
+
+def _share_nodes(budget: Budget, counted_nodes: int) -> int:
+    """
+    In a worker process of a parallel search, adds the nodes expanded since counted_nodes to the ones
+    of the whole search, which become the nodes of the budget, and cancels the budget when the search is stopped.
+    Returns the nodes counted so far, elsewhere does nothing.
+    """
+    if _shared_nodes is None:
+        return counted_nodes
+    with _shared_nodes.get_lock():
+        _shared_nodes.value += budget.nodes - counted_nodes
+        budget.nodes = _shared_nodes.value
+    if _stopped.value:
+        budget.cancel()
+    return budget.nodes
+
+def _init_restart_worker(solved_restart, shared_nodes, stopped) -> None:
+    """
+    Initializer of the worker processes, shares the lowest solved restart and the budget of the search with them.
+    """
+    global _solved_restart, _shared_nodes, _stopped
+    _solved_restart = solved_restart
+    _shared_nodes = shared_nodes
+    _stopped = stopped
+
+def best_partial_result(result: Tuple[List[State], int, int], best: Optional[Tuple], heuristic: Callable[[State], int]) -> Tuple:
+    """
+    Returns the better of the partial result of a restart and the best one so far (None at first),
+    scored on the last state of their paths (see progress).
+    """
+    score = progress(result[0][-1], heuristic(result[0][-1]))
+    if best is None or score < best[0]:
+        return score, result
+    return best
+
+def _parallel_restarts(workers: int, max_restarts: int, budget: Budget, restart_arguments: Tuple) -> Tuple[List[State], int, int]:
+    """
+    Runs the restarts in a process pool and returns the result of the lowest restart that found a solution.
+    Once a restart finds one, the later restarts stop, the earlier ones still run to the end,
+    so the result is the same as the one of a sequential search with the same seed.
+    Without a solution, the best partial result of the restarts is returned.
+    The budget holds for the whole search: the restarts add their nodes to a shared counter after every beam,
+    this process checks the budget (memory of the workers included) while they run,
+    and stops them all when it runs out or is cancelled.
+    """
+    start_state, beam_width, heuristic, seed, max_iterations, *options = restart_arguments
+    solved_restart = Value('q', max_restarts)
+    shared_nodes = Value('q', budget.nodes)
+    stopped = Value('b', 0)
+    best_restart = max_restarts
+    best_result = None
+    best_partial = None
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_restart_worker, initargs=(solved_restart, shared_nodes, stopped)) as pool:
+        pending = {}
+        next_restart = 0
+        while True:
+            # keep every worker busy, with restarts before the best solution only
+            while len(pending) < workers and next_restart < min(best_restart, max_restarts) and not budget.exceeded():
+                future = pool.submit(beam_search_restart, start_state, beam_width, heuristic, next_restart, seed, max_iterations, budget, *options)
+                pending[future] = next_restart
+                next_restart += 1
+
+            if not pending:
                 break
 
-        # increment restart count
-        restart_count += 1
+            done, _ = wait(pending, timeout=PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+            budget.nodes = shared_nodes.value
+            if budget.exceeded(check_memory=True):
+                stopped.value = 1
+            for future in done:
+                restart = pending.pop(future)
+                result = future.result()
+                if not result[0][-1].is_solved():
+                    best_partial = best_partial_result(result, best_partial, heuristic)
+                elif restart < best_restart:
+                    best_restart = restart
+                    best_result = result
+                    with solved_restart.get_lock():
+                        solved_restart.value = restart
+
+    budget.nodes = shared_nodes.value
+    if best_result is None:
+        return best_partial[1] if best_partial is not None else (None, 0, 0)
+    return best_result
+
+def beam_search(start_node: Map, beam_width: int, heuristic: Callable[[State], int], max_restarts: int = 10000, max_iterations: int = 10000, prune_dead_squares: bool = False, prune_deadlocks: bool = False, successors: str = 'moves', batch_heuristic: Optional[Callable] = None, seed: int = 0, workers: int = 1, expansion_workers: int = 1, selection: str = 'stochastic', elite_fraction: float = ELITE_FRACTION, stats: Optional[SearchStats] = None, budget: Optional[Budget] = None) -> Tuple[List[State], int, int]:
+    """
+    Beam Search algorithm for Sokoban with stochasticity and restart mechanism.
+    The search runs on compact states, the returned path is a list of State objects.
+    With prune_dead_squares, pushes of a box on a dead square of the level are not generated.
+    With prune_deadlocks, successors where the moved box is in a freeze deadlock are discarded,
+    it needs 'pushes' successors (see check_deadlock_pruning).
+    successors selects the successor generator: 'moves' for single moves, 'pushes' for whole box pushes.
+    batch_heuristic, a BatchHeuristic function, scores the whole next beam in one vectorized call instead of heuristic.
+    Every restart draws from its own random stream, derived from seed (see restart_seed).
+    With workers > 1, independent restarts run in parallel in a process pool, the first solution
+    stops the later restarts and the result stays the same for a given seed.
+    With expansion_workers > 1, the expansion and scoring of each large beam is split across
+    that many worker processes instead, the result is the same as the one of a sequential search.
+    selection picks the next beam among the successors (see SELECTION_POLICIES): 'stochastic' samples with
+    replacement, 'top_k' keeps the best ones, 'without_replacement' samples distinct ones, and 'hybrid' keeps
+    the best elite_fraction of the beam and samples the rest.
+    stats, a SearchStats, times the phases of the search, the ones run in worker processes are not counted.
+    budget limits the time, expanded nodes and memory of the search (120 seconds by default). When the budget
+    or the restarts run out, the path to the best state of the beams is returned (see progress),
+    the caller checks whether its last state is solved.
+    """
+    if selection not in SELECTION_POLICIES:
+        raise ValueError(f"Unknown selection: {selection}")
+    if workers > 1 and expansion_workers > 1:
+        raise ValueError("Beam Search can run either parallel restarts or parallel expansion, not both")
+    if prune_deadlocks:
+        check_deadlock_pruning(successors)
+
+    start_state = State.from_map(start_node)
+
+    # set maximum time for the search
+    if budget is None:
+        budget = Budget(max_time=120)
+
+    # top-k selection doesn't draw random numbers, every restart would repeat the first one
+    if selection == 'top_k':
+        max_restarts = 1
+
+    options = (prune_dead_squares, prune_deadlocks, successors, batch_heuristic)
+    if workers > 1:
+        return _parallel_restarts(workers, max_restarts, budget, (start_state, beam_width, heuristic, seed, max_iterations, *options, selection, elite_fraction))
+
+    expansion_pool = None
+    if expansion_workers > 1:
+        expansion_pool = ProcessPoolExecutor(max_workers=expansion_workers, initializer=_init_expansion_worker, initargs=(start_state.level, heuristic, *options))
+
+    try:
+        best_partial = None
+        restart_count = 0
+        while not budget.exceeded() and restart_count < max_restarts:
+            result = beam_search_restart(start_state, beam_width, heuristic, restart_count, seed, max_iterations, budget, *options, selection, elite_fraction, expansion_pool, expansion_workers, stats)
+            if result[0][-1].is_solved():
+                return result  # goal is reached
+            best_partial = best_partial_result(result, best_partial, heuristic)
+
+            # increment restart count
+            restart_count += 1
+    finally:
+        if expansion_pool is not None:
+            expansion_pool.shutdown()
 
-    return None, total_pushes, total_pulls  # no solution found
+    if best_partial is None:
+        return None, 0, 0
+    return best_partial[1]  # no solution found, best partial path
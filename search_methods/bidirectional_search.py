@@ -0,0 +1,160 @@
+from typing import List, Optional, Tuple
+from sokoban.map import Map
+from sokoban.moves import BOX_LEFT, opposite_moves
+from sokoban.state import State
+from search_methods.deadlocks import check_deadlock_pruning, creates_deadlock
+from search_methods.search_stats import SearchStats
+from search_methods.budget import Budget, progress
+
+FORWARD = 0
+BACKWARD = 1
+
+
+def goal_states(start_state: State) -> List[State]:
+    """
+    Returns the solved states of the level, one for each zone the player can be in:
+    the boxes are on the targets and the player is on the first cell of a zone of connected free cells.
+    """
+    level = start_state.level
+    if len(start_state.boxes) != len(level.target_cells):
+        raise ValueError("Bidirectional search needs as many boxes as targets")
+
+    boxes = tuple(sorted(level.target_cells))
+    goals = []
+    covered = set()
+    for cell in range(level.cells):
+        if level.walls[cell] or cell in boxes or cell in covered:
+            continue
+        goal = State(level, cell, boxes)
+        covered.update(goal.reachable_cells())
+        goals.append(goal)
+    return goals
+
+def reverse_move(state: State) -> int:
+    """
+    Returns the move that undoes the move that produced the state.
+    A walk is undone by walking back, a push by pulling the box back, and a pull by pushing it back.
+    """
+    move = state.moves[0]
+    direction = move - 4 if move >= BOX_LEFT else move
+    if state.push_count:
+        return opposite_moves[direction] + 4
+    return opposite_moves[direction]
+
+def join_paths(forward_node: Tuple, backward_node: Tuple) -> List[State]:
+    """
+    Joins the forward path to the meeting state with the backward path from it to a goal.
+    The backward half is replayed with the reverse moves, so every state holds the forward move that produced it.
+    The path ends at its first solved state, the walk of the player to the cell of the goal state is left out.
+    """
+    path = []
+    node = forward_node
+    while node is not None:
+        state, node = node
+        path.append(state)
+    path.reverse()
+
+    state = path[-1]
+    node = backward_node
+    while node[1] is not None and not state.is_solved():
+        state = state.apply_move(reverse_move(node[0]))
+        node = node[1]
+        path.append(state)
+    return path
+
+def partial_result(forward_node: Tuple) -> Tuple[List[State], int, int]:
+    """
+    Returns the path to a forward node, with its pushes and pulls, for a search stopped before the goal.
+    """
+    path = join_paths(forward_node, (forward_node[0], None))
+    return path, sum(step.push_count for step in path), sum(step.pull_count for step in path)
+
+def bidirectional_search(start_node: Map, prune_dead_squares: bool = False, prune_deadlocks: bool = False, max_states: int = 2000000, stats: Optional[SearchStats] = None, budget: Optional[Budget] = None) -> Tuple[List[State], int, int]:
+    """
+    Bidirectional breadth-first search for Sokoban.
+    The moves are reversible: a walk is undone by a walk, a push by a pull and a pull by a push,
+    so the backward search from the goals expands states with the same successor generator as the forward one.
+    The forward search starts from the start state, the backward search from the solved states (see goal_states),
+    and the side with the smaller frontier is expanded one layer at a time. Both sides share a table keyed
+    by the Zobrist hash of the states, the search stops when one side generates a state of the other.
+    The search gives up when more than max_states states are known, which bounds its memory.
+    With prune_dead_squares and prune_deadlocks, the forward search prunes like the other engines,
+    the backward search doesn't, since it starts from the solved states. The searches walk, push and pull,
+    so prune_deadlocks raises ValueError (see check_deadlock_pruning).
+    stats, a SearchStats, times the phases of the search.
+    budget limits the time, expanded nodes and memory of the search (120 seconds by default), when it runs out
+    the forward path to the expanded state with the most boxes on targets is returned (see progress).
+    """
+    if prune_deadlocks:
+        check_deadlock_pruning('moves')
+    get_neighbours = State.get_neighbours
+    is_solved = State.is_solved
+    if stats is not None:
+        get_neighbours = stats.timed(SearchStats.MOVE_GENERATION, get_neighbours)
+        is_solved = stats.timed(SearchStats.GOAL_TEST, is_solved)
+
+    if budget is None:
+        budget = Budget(max_time=120)
+
+    start_state = State.from_map(start_node)
+    if is_solved(start_state):
+        return [start_state], 0, 0
+    # without a heuristic, partial paths are scored by the boxes on targets only
+    best_score, best_node = progress(start_state, 0), (start_state, None)
+
+    # Zobrist hash -> (direction, node), node: (state, parent node)
+    seen = {start_state.zobrist: (FORWARD, (start_state, None))}
+    frontiers = [[(start_state, None)], []]
+    for goal in goal_states(start_state):
+        seen[goal.zobrist] = (BACKWARD, (goal, None))
+        frontiers[BACKWARD].append((goal, None))
+    if stats is not None:
+        seen = stats.timed_lookups(SearchStats.DUPLICATE_CHECK, seen)
+
+    while frontiers[FORWARD] and frontiers[BACKWARD]:
+        # expand the smaller frontier
+        direction = FORWARD if len(frontiers[FORWARD]) <= len(frontiers[BACKWARD]) else BACKWARD
+        prune = direction == FORWARD
+        next_frontier = []
+        budget.frontier = len(frontiers[FORWARD]) + len(frontiers[BACKWARD])
+
+        for node in frontiers[direction]:
+            # stop when the budget runs out
+            if budget.exceeded():
+                return partial_result(best_node)
+
+            if prune:
+                score = progress(node[0], 0)
+                if score < best_score:
+                    best_score, best_node = score, node
+            budget.nodes += 1
+
+            for neighbour in get_neighbours(node[0], prune and prune_dead_squares):
+                if prune and prune_deadlocks and creates_deadlock(neighbour):
+                    continue
+
+                # the forward search can reach a solved state with the player outside the cell of the goal state
+                if prune and is_solved(neighbour):
+                    path = join_paths((neighbour, node), (neighbour, None))
+                    return path, sum(step.push_count for step in path), sum(step.pull_count for step in path)
+
+                entry = seen.get(neighbour.zobrist)
+                if entry is not None:
+                    if entry[0] == direction:
+                        continue  # already reached from this side
+                    # the two searches meet
+                    if direction == FORWARD:
+                        path = join_paths((neighbour, node), entry[1])
+                    else:
+                        path = join_paths(entry[1], (neighbour, node))
+                    return path, sum(step.push_count for step in path), sum(step.pull_count for step in path)
+
+                if len(seen) >= max_states:
+                    return partial_result(best_node)  # out of memory budget
+                neighbour_node = (neighbour, node)
+                seen[neighbour.zobrist] = (direction, neighbour_node)
+                next_frontier.append(neighbour_node)
+
+        frontiers[direction] = next_frontier
+
+    return None, 0, 0  # no solution found
@@ -0,0 +1,182 @@
+import multiprocessing
+import os
+import time
+from typing import Callable, Optional, Tuple
+from sokoban.state import State
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Budget checks between two reads of the resident memory, reading it costs a system call
+MEMORY_CHECK_INTERVAL = 1000
+
+# Seconds between two progress events
+PROGRESS_INTERVAL = 0.25
+
+TIME = 'time'
+NODES = 'nodes'
+MEMORY = 'memory'
+CANCELLED = 'cancelled'
+
+
+def resident_memory() -> Optional[int]:
+    """
+    Returns the resident memory of the process and of its worker processes in bytes, None where it can't be measured.
+    Where /proc isn't available, the peak resident memory of the process alone is returned instead.
+    """
+    try:
+        memory = 0
+        for pid in ['self'] + [process.pid for process in multiprocessing.active_children()]:
+            try:
+                with open(f'/proc/{pid}/statm') as file:
+                    memory += int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+            except FileNotFoundError:
+                if pid == 'self':
+                    raise
+                # the worker exited meanwhile
+        return memory
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # KB on Linux, bytes on macOS
+    return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+def progress(state: State, heuristic_value: float) -> Tuple[float, int]:
+    """
+    Score of a partial solution ending in the state, lower is better:
+    the heuristic of the state first, then the boxes that are not on a target.
+    """
+    return heuristic_value, len(state.boxes) - state.boxes_on_targets()
+
+
+class ProgressEvent:
+    """
+    Progress of a running search, sent by its budget (see Budget.progress).
+
+    Attributes:
+    nodes: number of expanded nodes
+    frontier: number of states waiting to be expanded (open list, beam, depth-first stack, both sides
+              of a bidirectional search, neighbours of the current state for LRTA*)
+    best_h: heuristic of the best state reached so far, None for the searches without a heuristic
+    elapsed: seconds since the start of the search
+    """
+    __slots__ = ('nodes', 'frontier', 'best_h', 'elapsed')
+
+    def __init__(self, nodes: int, frontier: int, best_h: Optional[float], elapsed: float):
+        self.nodes = nodes
+        self.frontier = frontier
+        self.best_h = best_h
+        self.elapsed = elapsed
+
+    def __str__(self):
+        ''' Overriding toString method for ProgressEvent class'''
+        best_h = '-' if self.best_h is None else f"{self.best_h:g}"
+        return f"{self.nodes} nodes, frontier {self.frontier}, best h {best_h}, {self.elapsed:.1f}s"
+
+
+class Budget:
+    """
+    Limits on the resources of a search: wall time, expanded nodes and resident memory.
+    The engines count the nodes they expand in nodes and call exceeded between two expansions,
+    they stop when it returns True and return the best partial path they found (see progress).
+    A limit set to None is not checked. cancel stops the search from another thread.
+    The memory is the one of the process and of its worker processes.
+    The engines keep frontier and best_h up to date, and exceeded calls progress with a ProgressEvent
+    every PROGRESS_INTERVAL seconds, from the thread of the search.
+
+    Attributes:
+    max_time: maximum wall time in seconds
+    max_nodes: maximum number of expanded nodes
+    max_memory: maximum resident memory of the process in MB
+    start_time: time the budget started at
+    nodes: number of expanded nodes
+    reason: the limit that was exceeded (TIME, NODES or MEMORY) or CANCELLED, None while the search is within budget
+    frontier: size of the frontier of the search (see ProgressEvent)
+    best_h: heuristic of the best state reached by the search
+    progress: function called with the ProgressEvent of the search, None to send none
+    """
+    def __init__(self, max_time: Optional[float] = None, max_nodes: Optional[int] = None, max_memory: Optional[float] = None, progress: Optional[Callable[[ProgressEvent], None]] = None):
+        if max_time is not None and max_time <= 0:
+            raise ValueError(f"max_time must be positive: {max_time}")
+        if max_nodes is not None and max_nodes <= 0:
+            raise ValueError(f"max_nodes must be positive: {max_nodes}")
+        if max_memory is not None and max_memory <= 0:
+            raise ValueError(f"max_memory must be positive: {max_memory}")
+        self.max_time = max_time
+        self.max_nodes = max_nodes
+        self.max_memory = max_memory
+        self.progress = progress
+        self.start()
+
+    def start(self) -> None:
+        """
+        Starts the budget over: the time runs from now and no node is expanded.
+        A cancelled budget stays cancelled, the search may be cancelled before it starts.
+        """
+        self.start_time = time.time()
+        self.nodes = 0
+        if getattr(self, 'reason', None) != CANCELLED:
+            self.reason = None
+        self.frontier = 0
+        self.best_h = None
+        self._checks = 0
+        self._next_report = self.start_time + PROGRESS_INTERVAL
+
+    @property
+    def deadline(self) -> float:
+        """
+        Time the time budget runs out at, infinity without a time limit.
+        """
+        if self.max_time is None:
+            return float('inf')
+        return self.start_time + self.max_time
+
+    def exceeded(self, check_memory: bool = False) -> bool:
+        """
+        Returns True when a limit is exceeded, and keeps which one in reason.
+        Once exceeded, the budget stays exceeded.
+        The memory is read every MEMORY_CHECK_INTERVAL checks, or at this one with check_memory.
+        """
+        if self.reason is not None:
+            return True
+        now = time.time()
+        if self.progress is not None and now >= self._next_report:
+            self._next_report = now + PROGRESS_INTERVAL
+            self.progress(ProgressEvent(self.nodes, self.frontier, self.best_h, now - self.start_time))
+        if self.max_time is not None and now - self.start_time > self.max_time:
+            self.reason = TIME
+        elif self.max_nodes is not None and self.nodes >= self.max_nodes:
+            self.reason = NODES
+        elif self.max_memory is not None:
+            self._checks += 1
+            if self._checks >= MEMORY_CHECK_INTERVAL or check_memory:
+                self._checks = 0
+                memory = resident_memory()
+                if memory is not None and memory > self.max_memory * 1024 * 1024:
+                    self.reason = MEMORY
+        return self.reason is not None
+
+    def cancel(self) -> None:
+        """
+        Stops the search at its next check, it returns its best partial path.
+        """
+        if self.reason is None:
+            self.reason = CANCELLED
+
+    def __getstate__(self):
+        # the progress function stays in this process, worker processes send no progress
+        state = dict(self.__dict__)
+        state['progress'] = None
+        return state
+
+    def __str__(self):
+        ''' Overriding toString method for Budget class'''
+        limits = [f"{self.max_time}s" if self.max_time is not None else None,
+                  f"{self.max_nodes} nodes" if self.max_nodes is not None else None,
+                  f"{self.max_memory} MB" if self.max_memory is not None else None]
+        status = f", stopped: {self.reason}" if self.reason is not None else ""
+        return f"Budget({', '.join(limit for limit in limits if limit is not None) or 'unlimited'}: {self.nodes} nodes in {time.time() - self.start_time:.2f}s{status})"
@@ -0,0 +1,181 @@
+import hashlib
+import mmap
+import os
+import struct
+from sokoban.level import Level
+
+# File layout: header, then the keys (unsigned 64-bit) and the costs (64-bit floats) of the slots
+HEADER = struct.Struct('<8sIIQQ8s24x')  # magic, version, unused, capacity, count, fingerprint of the level and settings
+COUNT_OFFSET = 24
+MAGIC = b'LRTACOST'
+VERSION = 2
+INITIAL_CAPACITY = 1 << 12
+MAX_LOAD = 0.7
+
+# Key of the empty slots, the Zobrist hash 0 is stored as EMPTY_KEY_ALIAS
+EMPTY_KEY = 0
+EMPTY_KEY_ALIAS = 1
+
+
+class CostTable:
+    """
+    Hash table of the costs learned by LRTA*, keyed by the Zobrist hash of the states
+    and stored in a memory-mapped file, so it outlives a run and warm-starts the next runs on the same level.
+    Open addressing with linear probing over a power of two number of slots, the file grows (doubling
+    its slots) when it is more than MAX_LOAD full. The costs depend on the heuristic they started from,
+    on the successors (single moves or whole pushes don't count the same steps) and on the pruning (a state
+    with only pruned neighbours is learned as a dead end): a file written for another level or other settings
+    is started over.
+    Supports the dictionary operations LRTA* uses: get, in, [] and len.
+
+    Attributes:
+    path: path of the file
+    level: level the costs were learned on
+    fingerprint: hash of the level and of the settings the costs were learned with
+    capacity: number of slots
+    count: number of stored costs
+    """
+    def __init__(self, path: str, level: Level, heuristic: str = '', successors: str = 'moves', prune_dead_squares: bool = False, prune_deadlocks: bool = False):
+        self.path = path
+        self.level = level
+        settings = repr((level.fingerprint, heuristic, successors, prune_dead_squares, prune_deadlocks))
+        self.fingerprint = hashlib.blake2b(settings.encode(), digest_size=8).digest()
+        self._file = None
+        self._mmap = None
+        self._keys = None
+        self._costs = None
+
+        if not self._open():
+            self._create(path, INITIAL_CAPACITY)
+            self._open()
+
+    def _create(self, path: str, capacity: int) -> None:
+        """
+        Writes an empty table with the given number of slots.
+        """
+        with open(path, 'wb') as file:
+            file.write(HEADER.pack(MAGIC, VERSION, 0, capacity, 0, self.fingerprint))
+            file.truncate(HEADER.size + capacity * 16)
+
+    def _open(self) -> bool:
+        """
+        Maps the file, returns False if it is missing or doesn't hold a table of this level and settings.
+        """
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, 'rb') as file:
+            header = file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            return False
+        magic, version, _, capacity, count, fingerprint = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION or fingerprint != self.fingerprint:
+            return False
+        if os.path.getsize(self.path) != HEADER.size + capacity * 16:
+            return False
+
+        self._file = open(self.path, 'r+b')
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+        view = memoryview(self._mmap)
+        self._keys = view[HEADER.size:HEADER.size + capacity * 8].cast('Q')
+        self._costs = view[HEADER.size + capacity * 8:].cast('d')
+        view.release()
+        self.capacity = capacity
+        self.count = count
+        return True
+
+    def _slot(self, key: int) -> int:
+        """
+        Returns the slot holding the key, or the empty slot where it would be inserted.
+        """
+        keys = self._keys
+        mask = self.capacity - 1
+        slot = key & mask
+        while keys[slot] != EMPTY_KEY and keys[slot] != key:
+            slot = (slot + 1) & mask
+        return slot
+
+    def _grow(self) -> None:
+        """
+        Rewrites the table with twice the slots, the new file replaces the old one atomically.
+        """
+        entries = [(key, cost) for key, cost in zip(self._keys, self._costs) if key != EMPTY_KEY]
+        capacity = self.capacity * 2
+        self.close()
+
+        temporary_path = self.path + '.tmp'
+        self._create(temporary_path, capacity)
+        os.replace(temporary_path, self.path)
+        self._open()
+        for key, cost in entries:
+            slot = self._slot(key)
+            self._keys[slot] = key
+            self._costs[slot] = cost
+        self.count = len(entries)
+        self._write_count()
+
+    def _write_count(self) -> None:
+        struct.pack_into('<Q', self._mmap, COUNT_OFFSET, self.count)
+
+    def get(self, key: int, default=None):
+        """
+        Returns the cost of the key, default if it isn't stored.
+        """
+        key = key or EMPTY_KEY_ALIAS
+        slot = self._slot(key)
+        if self._keys[slot] == EMPTY_KEY:
+            return default
+        return self._costs[slot]
+
+    def __contains__(self, key: int) -> bool:
+        key = key or EMPTY_KEY_ALIAS
+        return self._keys[self._slot(key)] != EMPTY_KEY
+
+    def __getitem__(self, key: int) -> float:
+        cost = self.get(key)
+        if cost is None:
+            raise KeyError(key)
+        return cost
+
+    def __setitem__(self, key: int, cost: float) -> None:
+        key = key or EMPTY_KEY_ALIAS
+        slot = self._slot(key)
+        if self._keys[slot] == EMPTY_KEY:
+            if self.count + 1 > self.capacity * MAX_LOAD:
+                self._grow()
+                slot = self._slot(key)
+            self._keys[slot] = key
+            self.count += 1
+            self._write_count()
+        self._costs[slot] = cost
+
+    def __len__(self) -> int:
+        return self.count
+
+    def flush(self) -> None:
+        """
+        Writes the changes to the file.
+        """
+        if self._mmap is not None:
+            self._mmap.flush()
+
+    def close(self) -> None:
+        """
+        Writes the changes and unmaps the file.
+        """
+        if self._mmap is None:
+            return
+        self._mmap.flush()
+        self._keys.release()
+        self._costs.release()
+        self._mmap.close()
+        self._file.close()
+        self._keys = self._costs = self._mmap = self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __str__(self):
+        return f"CostTable({self.path}: {self.count} costs in {self.capacity} slots)"
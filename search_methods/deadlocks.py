@@ -0,0 +1,83 @@
+from typing import List, Set
+from sokoban.level import Level
+from sokoban.moves import LEFT, RIGHT, UP, DOWN
+from sokoban.state import State
+
+
+def _is_blocked_on_axis(level: Level, boxes: Set[int], cell: int, first_move: int, second_move: int, checked: Set[int], frozen: List[int]) -> bool:
+    """
+    Check if the box on cell can't be moved along the axis given by the two opposite moves.
+    Boxes already in checked are treated as walls.
+    """
+    first = level.neighbours[cell][first_move - 1]
+    second = level.neighbours[cell][second_move - 1]
+
+    # a wall (or the edge of the map) on either side
+    if first < 0 or second < 0:
+        return True
+
+    # both sides are dead squares, the box can't be moved there
+    if level.dead_squares[first] and level.dead_squares[second]:
+        return True
+
+    # a box on either side that can't be moved either
+    for neighbour in (first, second):
+        if neighbour in boxes:
+            if neighbour in checked or _is_frozen(level, boxes, neighbour, checked, frozen):
+                return True
+
+    return False
+
+
+def _is_frozen(level: Level, boxes: Set[int], cell: int, checked: Set[int], frozen: List[int]) -> bool:
+    """
+    Check if the box on cell is blocked along both axes.
+    Every box found frozen on the way is appended to frozen, the boxes found frozen while exploring
+    a box that turns out not to be frozen are removed: they were only frozen with that box as a wall.
+    """
+    checked.add(cell)
+    found = len(frozen)
+
+    frozen_box = (_is_blocked_on_axis(level, boxes, cell, LEFT, RIGHT, checked, frozen)
+                  and _is_blocked_on_axis(level, boxes, cell, UP, DOWN, checked, frozen))
+    if frozen_box:
+        frozen.append(cell)
+    else:
+        del frozen[found:]
+
+    return frozen_box
+
+
+def is_freeze_deadlock(level: Level, boxes: Set[int], cell: int) -> bool:
+    """
+    Check if the box on cell is part of a freeze deadlock: a group of boxes that block each
+    other along both axes, with at least one of them not on a target.
+    Only the box on cell and the boxes next to it are examined.
+    """
+    frozen = []
+    if not _is_frozen(level, boxes, cell, set(), frozen):
+        return False
+
+    return any(box not in level.target_cells for box in frozen)
+
+
+def check_deadlock_pruning(successors: str) -> None:
+    """
+    Raises ValueError unless freeze deadlocks can be pruned with the successor generator:
+    with single moves a frozen box can still be pulled out, only 'pushes' never pulls a box.
+    """
+    if successors != 'pushes':
+        raise ValueError(f"Freeze deadlocks can only be pruned with 'pushes' successors, a frozen box can be pulled out with '{successors}'")
+
+
+def creates_deadlock(state: State) -> bool:
+    """
+    Check if the move that produced the state froze the box it moved.
+    Engines can call it on every successor to discard the dead ones.
+    Deadlocks are detected for pushes, a frozen box can still be pulled out when pulls are allowed
+    (see check_deadlock_pruning).
+    """
+    if state.moved_box is None:
+        return False
+
+    return is_freeze_deadlock(state.level, set(state.boxes), state.moved_box[1])
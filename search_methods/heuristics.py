@@ -1,6 +1,74 @@
 import math
-from sokoban.box import Box
+import weakref
+from collections import OrderedDict
+from typing import List, Tuple
 from sokoban.map import Map
+from search_methods.deadlocks import is_freeze_deadlock
+
+# Number of box configurations of a level whose matching is kept for incremental updates
+MATCHING_CACHE_SIZE = 10000
+
+# level -> (sorted box cells -> (cost, box cells by row, u, v, p) of the minimum-cost matching),
+# the matchings of a level are freed with it, a long-running process doesn't keep every level it solved
+_matching_solutions = weakref.WeakKeyDictionary()
+
+
+def _matching_costs(level, box: int, size: int) -> List[int]:
+    """
+    Returns the row of the cost matrix for a box, with a leading 0 for the 1-indexed Hungarian algorithm.
+    Columns after the real targets and rows of missing boxes (box -1) are padding, they cost nothing.
+    """
+    if box < 0:
+        return [0] * (size + 1)
+    cells = level.cells
+    push_distances = level.push_distances
+    targets = len(level.targets)
+    return [0] + [push_distances[(column - 1) * cells + box] if column <= targets else 0 for column in range(1, size + 1)]
+
+
+def _assign_row(costs: List[List[int]], u: List[int], v: List[int], p: List[int], row: int) -> None:
+    """
+    One step of the Hungarian algorithm: assigns the free row along a shortest augmenting path.
+    u and v are the row and column potentials, p[column] is the row assigned to the column (0 if free).
+    Potentials have to be feasible and the assigned edges tight, which holds after every step.
+    """
+    size = len(v) - 1
+    minv = [math.inf] * (size + 1)
+    used = [False] * (size + 1)
+    way = [0] * (size + 1)
+    p[0] = row
+    column = 0
+    while True:
+        used[column] = True
+        current_row = p[column]
+        delta = math.inf
+        next_column = 0
+        row_costs = costs[current_row]
+        for j in range(1, size + 1):
+            if not used[j]:
+                reduced = row_costs[j] - u[current_row] - v[j]
+                if reduced < minv[j]:
+                    minv[j] = reduced
+                    way[j] = column
+                if minv[j] < delta:
+                    delta = minv[j]
+                    next_column = j
+        for j in range(size + 1):
+            if used[j]:
+                u[p[j]] += delta
+                v[j] -= delta
+            else:
+                minv[j] -= delta
+        column = next_column
+        if p[column] == 0:
+            break
+
+    # flip the augmenting path
+    while column:
+        previous_column = way[column]
+        p[column] = p[previous_column]
+        column = previous_column
+
 
 class Heuristic:
     """
@@ -10,24 +78,24 @@ class Heuristic:
         """
         Heuristic function for Sokoban.
         Calculates the Manhattan distance between boxes and their closest targets.
+        The distances from every cell to all the targets are summed once per level, in level.manhattan_sums.
         """
+        manhattan_sums = map.level.manhattan_sums
         total_distance = 0
-        for box in map.boxes.values():
-            for target in map.targets:
-                distance = abs(box.x - target[0]) + abs(box.y - target[1])
-                total_distance += distance
+        for box in map.box_cells:
+            total_distance += manhattan_sums[box]
         return total_distance
     
     def euclidian_heuristic(map: Map) -> int:
         """
         Heuristic function for Sokoban.
         Calculates the Euclidean distance between boxes and their closest targets.
+        The distances from every cell to all the targets are summed once per level, in level.euclidian_sums.
         """
+        euclidian_sums = map.level.euclidian_sums
         total_distance = 0
-        for box in map.boxes.values():
-            for target in map.targets:
-                distance = math.sqrt((box.x - target[0])**2 + (box.y - target[1])**2)
-                total_distance += distance
+        for box in map.box_cells:
+            total_distance += euclidian_sums[box]
         return total_distance
     
     def minimum_euclidian(map: Map) -> int:
@@ -36,9 +104,9 @@ class Heuristic:
         Calculates the minimum Euclidean distance between boxes and their closest targets.
         """
         minimum_distance = 0
-        for box in map.boxes.values():
+        for box_x, box_y in map.box_positions:
             for target in map.targets:
-                distance = math.sqrt((box.x - target[0])**2 + (box.y - target[1])**2)
+                distance = math.sqrt((box_x - target[0])**2 + (box_y - target[1])**2)
                 if distance < minimum_distance:
                     minimum_distance = distance
         return minimum_distance
@@ -49,24 +117,96 @@ class Heuristic:
         Calculates the minimum Manhattan distance between boxes and their closest targets.
         """
         minimum_distance = 0
-        for box in map.boxes.values():
+        for box_x, box_y in map.box_positions:
             for target in map.targets:
-                distance = abs(box.x - target[0]) + abs(box.y - target[1])
+                distance = abs(box_x - target[0]) + abs(box_y - target[1])
                 if distance < minimum_distance:
                     minimum_distance = distance
         return minimum_distance
     
+    def push_distance_heuristic(map: Map) -> int:
+        """
+        Heuristic function for Sokoban.
+        Calculates the number of pushes between boxes and their closest targets, going around the walls.
+        The distances are computed once per level, in level.min_push_distances.
+        """
+        min_push_distances = map.level.min_push_distances
+        total_distance = 0
+        for box in map.box_cells:
+            total_distance += min_push_distances[box]
+        return total_distance
+
+    def matching_heuristic(map: Map) -> int:
+        """
+        Heuristic function for Sokoban.
+        Calculates the minimum total number of pushes when every box goes to a different target,
+        with a minimum-cost matching (Hungarian algorithm) over the push distances.
+        When only one box moved since a state whose matching is known, the matching is repaired
+        by reassigning that box alone, instead of being solved again.
+        """
+        level = map.level
+        box_cells = map.box_cells
+        key_boxes = tuple(sorted(box_cells))
+        size = max(len(box_cells), len(level.targets))
+
+        solutions = _matching_solutions.get(level)
+        if solutions is None:
+            solutions = _matching_solutions[level] = OrderedDict()
+        solution = solutions.get(key_boxes)
+        if solution is not None:
+            solutions.move_to_end(key_boxes)
+            return solution[0]
+
+        parent = None
+        moved_box = getattr(map, 'moved_box', None)
+        if moved_box is not None:
+            moved_from, moved_to = moved_box
+            parent_boxes = tuple(sorted(moved_from if box == moved_to else box for box in key_boxes))
+            parent = solutions.get(parent_boxes)
+
+        if parent is not None:
+            # Incremental update: only the row of the moved box changes
+            _, rows, u, v, p = parent
+            rows, u, v, p = list(rows), list(u), list(v), list(p)
+            row = rows.index(moved_from)
+            rows[row] = moved_to
+            costs = [None] + [_matching_costs(level, box, size) for box in rows[1:]]
+            p[p.index(row, 1)] = 0
+            u[row] = min(costs[row][column] - v[column] for column in range(1, size + 1))
+            _assign_row(costs, u, v, p, row)
+        else:
+            # Padding rows (-1) stand for missing boxes
+            rows = [None] + list(key_boxes) + [-1] * (size - len(key_boxes))
+            costs = [None] + [_matching_costs(level, box, size) for box in rows[1:]]
+            u = [0] * (size + 1)
+            v = [0] * (size + 1)
+            p = [0] * (size + 1)
+            for row in range(1, size + 1):
+                _assign_row(costs, u, v, p, row)
+
+        total_distance = sum(costs[p[column]][column] for column in range(1, size + 1))
+        solutions[key_boxes] = (total_distance, rows, u, v, p)
+        if len(solutions) > MATCHING_CACHE_SIZE:
+            solutions.popitem(last=False)
+
+        return total_distance
+
     @staticmethod
-    def is_box_blocked(map: Map, box: Box) -> bool:
+    def is_box_blocked(map: Map, box: Tuple[int, int]) -> bool:
         """
-        Check if a box is blocked (in a corner, not on a target).
+        Check if a box, given by its (x, y) position, is blocked (in a corner, not on a target).
         """
-        x, y = box.x, box.y
+        x, y = box
+        level = map.level
+        obstacles = level.obstacle_positions
+        # Corners and the other dead squares of the level can't be left by pushing
+        if level.dead_squares[level.cell(x, y)]:
+            return True
         # Check if the box is in a corner, not on a target
-        if (x, y) not in map.targets:
-            if ((x - 1, y) in map.obstacles and (x + 1, y) in map.obstacles):
+        if (x, y) not in level.target_positions:
+            if ((x - 1, y) in obstacles and (x + 1, y) in obstacles):
                 return True
-            if ((x, y - 1) in map.obstacles and (x, y + 1) in map.obstacles):
+            if ((x, y - 1) in obstacles and (x, y + 1) in obstacles):
                 return True
         return False
     
@@ -85,11 +225,12 @@ class Heuristic:
         blocking_penalty = 50  # penalization for boxes blocking other boxes
         player_distance_weight = 3  # weight the distance between player and closest box
 
+        box_positions = map.box_positions
+        manhattan_sums = map.level.manhattan_sums
+
         # Calculate minimum Manhattan distance for each box
-        for box in map.boxes.values():
-            for target in map.targets:
-                distance = abs(box.x - target[0]) + abs(box.y - target[1])
-                total_distance += distance
+        for box in box_positions:
+            total_distance += manhattan_sums[map.level.cell(*box)]
 
             # Penalize blocked boxes
             if Heuristic.is_box_blocked(map, box):
@@ -101,8 +242,9 @@ class Heuristic:
 
         # get minimum distance between player and a box
         min_player_distance = float('inf')
-        for box in map.boxes.values():
-            distance = abs(map.player.x - box.x) + abs(map.player.y - box.y)
+        player_x, player_y = map.player_position
+        for box_x, box_y in box_positions:
+            distance = abs(player_x - box_x) + abs(player_y - box_y)
             if distance < min_player_distance:
                 min_player_distance = distance
 
@@ -112,48 +254,72 @@ class Heuristic:
         return total_distance
 
     @staticmethod
-    def is_box_blocking_bad_placed(map: Map, box: Box) -> bool:
-        """
-        Check if a box is blocking access to other boxes or targets.
-        """
-        x, y = box.x, box.y
-        # Check if the box is adjacent to another box or target and blocks access
-        for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            neighbor = (x + dx, y + dy)
-            if neighbor in map.boxes:
-                # Check if the neighbour box is on a target
-                if (x + dx, y + dy) in map.targets:
-                    continue
-                # Check if the neighbor box is blocked by this box
-                x_neighbor, y_neighbor = map.boxes[neighbor].x, map.boxes[neighbor].y
-                # if x and y are on the left of the neighbour, and the neighbour has up or down AND right with an obstacle or other box,
-                # then the box is blocking the neighbour
-                # if i am on the left
-                if (x < x_neighbor and y == y_neighbor):
-                    # check if the neighbour has up or down AND right with an obstacle or other box
-                    if (x_neighbor, y_neighbor - 1) in map.obstacles or (x_neighbor, y_neighbor - 1) in map.boxes:
-                        # check if the right is an obstacle or other box
-                        if (x_neighbor + 1, y_neighbor) in map.obstacles or (x_neighbor + 1, y_neighbor) in map.boxes:
-                            return True
-                # if i am on the right
-                if (x > x_neighbor and y == y_neighbor):
-                    # check if the neighbour has up or down AND left with an obstacle or other box
-                    if (x_neighbor, y_neighbor - 1) in map.obstacles or (x_neighbor, y_neighbor - 1) in map.boxes:
-                        # check if the left is an obstacle or other box
-                        if (x_neighbor - 1, y_neighbor) in map.obstacles or (x_neighbor - 1, y_neighbor) in map.boxes:
-                            return True
-                # if i am on the uper side
-                if (x == x_neighbor and y < y_neighbor):
-                    # check if the neighbour has left or right AND down with an obstacle or other box
-                    if (x_neighbor - 1, y_neighbor) in map.obstacles or (x_neighbor - 1, y_neighbor) in map.boxes:
-                        # check if the down is an obstacle or other box
-                        if (x_neighbor, y_neighbor + 1) in map.obstacles or (x_neighbor, y_neighbor + 1) in map.boxes:
-                            return True
-                # if i am on the down side
-                if (x == x_neighbor and y > y_neighbor):
-                    # check if the neighbour has left or right AND up with an obstacle or other box
-                    if (x_neighbor - 1, y_neighbor) in map.obstacles or (x_neighbor - 1, y_neighbor) in map.boxes:
-                        # check if the up is an obstacle or other box
-                        if (x_neighbor, y_neighbor - 1) in map.obstacles or (x_neighbor, y_neighbor - 1) in map.boxes:
-                            return True
-        return False
+    def is_box_blocking_bad_placed(map: Map, box: Tuple[int, int]) -> bool:
+        """
+        Check if a box, given by its (x, y) position, is frozen together with other boxes or walls
+        while some of the frozen boxes are not on targets (see deadlocks.is_freeze_deadlock).
+        """
+        level = map.level
+        boxes = {level.cell(box_x, box_y) for box_x, box_y in map.box_positions}
+        return is_freeze_deadlock(level, boxes, level.cell(*box))
+
+
+# Heuristics whose value depends on where the player stands, not only on the boxes
+PLAYER_DEPENDENT_HEURISTICS = {Heuristic.combined_heuristic}
+
+
+class CachedHeuristic:
+    """
+    Memoization layer around a heuristic, with a bounded size and LRU eviction.
+    Heuristics that only look at the boxes are keyed by the box configuration,
+    so states that differ only in the player position share one entry.
+
+    Attributes:
+    heuristic: wrapped heuristic function
+    maxsize: maximum number of cached values
+    depends_on_player: if the heuristic depends on the player position (keyed by the whole state)
+    hits: number of values found in the cache
+    misses: number of values computed by the heuristic
+    """
+    def __init__(self, heuristic, maxsize: int = 100000, depends_on_player: bool = None):
+        if depends_on_player is None:
+            depends_on_player = heuristic in PLAYER_DEPENDENT_HEURISTICS
+
+        self.heuristic = heuristic
+        self.maxsize = maxsize
+        self.depends_on_player = depends_on_player
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, map: Map) -> int:
+        """
+        Returns the cache key of a state: its Zobrist hash, without the player when the heuristic ignores him.
+        """
+        level = map.level
+        zobrist = getattr(map, 'zobrist', None)
+        if zobrist is None:
+            zobrist = level.zobrist_hash(map.player_cell, map.box_cells)
+        if self.depends_on_player:
+            return zobrist
+        return zobrist ^ level.zobrist_player[map.player_cell]
+
+    def __call__(self, map: Map) -> int:
+        key = self.key(map)
+        cache = self.cache
+        value = cache.get(key)
+        if value is not None:
+            self.hits += 1
+            cache.move_to_end(key)
+            return value
+
+        self.misses += 1
+        value = self.heuristic(map)
+        cache[key] = value
+        if len(cache) > self.maxsize:
+            cache.popitem(last=False)
+        return value
+
+    def __str__(self):
+        ''' Overriding toString method for CachedHeuristic class'''
+        return f'Heuristic cache: {len(self.cache)}/{self.maxsize} entries, {self.hits} hits, {self.misses} misses'
@@ -0,0 +1,121 @@
+from collections import OrderedDict
+from typing import List, Optional, Tuple, Callable
+from sokoban.map import Map
+from sokoban.state import State, SUCCESSOR_GENERATORS
+from search_methods.deadlocks import check_deadlock_pruning, creates_deadlock
+from search_methods.search_stats import SearchStats
+from search_methods.budget import Budget, progress
+
+
+class IDA_star:
+    """
+    IDA* algorithm for Sokoban.
+    """
+    @staticmethod
+    def IDA_star(initial_map: Map, heuristic: Callable[[State], int], prune_dead_squares: bool = False, prune_deadlocks: bool = False, successors: str = 'moves', table_size: int = 1000000, stats: Optional[SearchStats] = None, budget: Optional[Budget] = None) -> Tuple[List[State], int, int]:
+        """
+        IDA* algorithm for Sokoban.
+        Depth-first searches bounded by a threshold on f = g + h, raised to the lowest f over the threshold
+        after every iteration. The cost of a path is its number of player moves, as in A*.
+        A transposition table keyed by the Zobrist hash keeps the heuristic of the states and the lowest cost
+        they were reached with in the current iteration, so transpositions aren't searched again.
+        The table holds at most table_size states, the oldest ones are dropped first,
+        so the memory used doesn't grow with the search.
+        With prune_dead_squares, pushes of a box on a dead square of the level are not generated.
+        With prune_deadlocks, neighbours where the moved box is in a freeze deadlock are discarded,
+        it needs 'pushes' successors (see check_deadlock_pruning).
+        successors selects the successor generator: 'moves' for single moves, 'pushes' for whole box pushes.
+        stats, a SearchStats, times the phases of the search.
+        budget limits the time, expanded nodes and memory of the search (120 seconds by default),
+        when it runs out the path to the best state reached so far is returned (see progress).
+        """
+        if prune_deadlocks:
+            check_deadlock_pruning(successors)
+        get_neighbours = SUCCESSOR_GENERATORS[successors]
+        is_solved = State.is_solved
+        if stats is not None:
+            get_neighbours = stats.timed(SearchStats.MOVE_GENERATION, get_neighbours)
+            is_solved = stats.timed(SearchStats.GOAL_TEST, is_solved)
+            heuristic = stats.timed(SearchStats.HEURISTIC, heuristic)
+        if budget is None:
+            budget = Budget(max_time=120)
+        start_state = State.from_map(initial_map)
+
+        def expand(state):
+            # iterator over the neighbours of the state, without the deadlocked ones
+            return (neighbour for neighbour in get_neighbours(state, prune_dead_squares)
+                    if not (prune_deadlocks and creates_deadlock(neighbour)))
+
+        if is_solved(start_state):
+            return [start_state], 0, 0
+
+        table = OrderedDict()  # Zobrist hash -> [iteration, lowest cost, heuristic]
+        if stats is not None:
+            table = stats.timed_lookups(SearchStats.DUPLICATE_CHECK, table)
+        threshold = int(heuristic(start_state))
+        iteration = 0
+        best_score, best_path = progress(start_state, threshold), [start_state]
+        budget.best_h = threshold
+
+        while True:
+            next_threshold = float('inf')
+            stack = [(start_state, 0, expand(start_state))]  # (state, cost, neighbours left to search)
+            on_path = {start_state.zobrist}
+            if stats is not None:
+                on_path = stats.timed_lookups(SearchStats.DUPLICATE_CHECK, on_path)
+
+            while stack:
+                # stop when the budget runs out
+                if budget.exceeded():
+                    return best_path, sum(step.push_count for step in best_path), sum(step.pull_count for step in best_path)
+
+                state, cost, neighbours = stack[-1]
+                neighbour = next(neighbours, None)
+                if neighbour is None:
+                    # every neighbour was searched, backtrack
+                    stack.pop()
+                    on_path.discard(state.zobrist)
+                    continue
+
+                key = neighbour.zobrist
+                if key in on_path:
+                    continue
+
+                new_cost = cost + len(neighbour.moves)
+                entry = table.get(key)
+                if entry is None:
+                    if len(table) >= table_size:
+                        table.popitem(last=False)
+                    entry = table[key] = [iteration, new_cost, int(heuristic(neighbour))]
+                    # keep the most advanced state, new states only
+                    if entry[2] <= best_score[0]:
+                        score = progress(neighbour, entry[2])
+                        if score < best_score:
+                            best_score, best_path = score, [step[0] for step in stack] + [neighbour]
+                            budget.best_h = entry[2]
+                elif entry[0] == iteration and entry[1] <= new_cost:
+                    continue  # already searched in this iteration, with a lower cost
+                else:
+                    entry[0] = iteration
+                    entry[1] = new_cost
+
+                f = new_cost + entry[2]
+                if f > threshold:
+                    next_threshold = min(next_threshold, f)
+                    continue
+
+                if is_solved(neighbour):
+                    path = [step[0] for step in stack] + [neighbour]
+                    return path, sum(step.push_count for step in path), sum(step.pull_count for step in path)
+
+                stack.append((neighbour, new_cost, expand(neighbour)))
+                budget.nodes += 1
+                budget.frontier = len(stack)
+                on_path.add(key)
+
+            if next_threshold == float('inf'):
+                return None, 0, 0  # no solution found
+
+            # raise the threshold to the lowest f that was cut off
+            threshold = next_threshold
+            iteration += 1
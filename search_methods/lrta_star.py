@@ -1,55 +1,189 @@
-from typing import List, Tuple, Callable
+from typing import Callable, List, MutableMapping, Optional, Tuple
 from sokoban.map import Map
+from sokoban.state import State, SUCCESSOR_GENERATORS
+from search_methods.deadlocks import check_deadlock_pruning, creates_deadlock
+from search_methods.search_stats import SearchStats
+from search_methods.budget import Budget, progress
 import time
 
 
+class DecisionTimeout(Exception):
+    """
+    Raised when the time budget of a decision runs out during the lookahead.
+    """
+
+
 class LRTA_star:
     """
     LRTA* algorithm for Sokoban.
     """
     @staticmethod
-    def LRTA_star(initial_map: Map, heuristic: Callable[[Map], int]) -> Tuple[List[Map], int, int]:
+    def LRTA_star(initial_map: Map, heuristic: Callable[[State], int], prune_dead_squares: bool = False, prune_deadlocks: bool = False, successors: str = 'moves', trials: int = 1, cost_table: Optional[MutableMapping[int, float]] = None, lookahead: int = 1, move_time_budget: Optional[float] = None, budget: Optional[Budget] = None, stats: Optional[SearchStats] = None) -> Tuple[List[State], int, int]:
         """
         LRTA* algorithm for Sokoban.
+        The search runs on compact states, the returned path is a list of State objects.
+        With prune_dead_squares, pushes of a box on a dead square of the level are not generated.
+        With prune_deadlocks, neighbours where the moved box is in a freeze deadlock are discarded,
+        it needs 'pushes' successors (see check_deadlock_pruning).
+        successors selects the successor generator: 'moves' for single moves, 'pushes' for whole box pushes.
+        Runs up to trials trials from the start, each one learning on the costs of the previous ones,
+        and stops early when a trial follows the same path as the previous one. The shortest path is returned.
+        cost_table holds the learned costs, keyed by the Zobrist hash of the states: a CostTable keeps them
+        on disk for the next runs on the level, by default they are kept in memory for this call only.
+        lookahead is the depth of the local search run before every move (1 looks at the neighbours only).
+        With move_time_budget (in seconds), a decision searches deeper only while the budget lasts,
+        and commits to the best move of the deepest search that finished.
+        budget limits the time, expanded nodes (lookahead included) and memory of the whole search (30 seconds by default),
+        when it runs out before a trial reaches the goal, the path of the last trial up to its best state is returned (see progress).
+        stats, a SearchStats, times the phases of the search, the lookups of the learned costs are
+        the duplicate checks (they aren't timed when the costs are in a cost_table).
+        """
+        if prune_deadlocks:
+            check_deadlock_pruning(successors)
+        get_neighbours = SUCCESSOR_GENERATORS[successors]
+        is_solved = State.is_solved
+        if budget is None:
+            budget = Budget(max_time=30)
+        start_state = State.from_map(initial_map)
+        cost = cost_table if cost_table is not None else {}  # learned costs of the visited states
+        if stats is not None:
+            get_neighbours = stats.timed(SearchStats.MOVE_GENERATION, get_neighbours)
+            is_solved = stats.timed(SearchStats.GOAL_TEST, is_solved)
+            heuristic = stats.timed(SearchStats.HEURISTIC, heuristic)
+            if cost_table is None:
+                cost = stats.timed_lookups(SearchStats.DUPLICATE_CHECK, cost)
+
+        def expand(state):
+            # neighbours of the state, without the deadlocked ones
+            budget.nodes += 1
+            neighbours = get_neighbours(state, prune_dead_squares)
+            if prune_deadlocks:
+                neighbours = [neighbour for neighbour in neighbours if not creates_deadlock(neighbour)]
+            return neighbours
+
+        best_path, best_push_count, best_pull_count = None, 0, 0
+        previous_keys = None
+        for _ in range(trials):
+            path, push_count, pull_count = LRTA_star.trial(start_state, heuristic, cost, expand, lookahead, move_time_budget, budget, is_solved)
+            if budget.exceeded():
+                # the trial stopped on the way, its partial path is better than nothing
+                if best_path is None and path is not None:
+                    best_path, best_push_count, best_pull_count = path, push_count, pull_count
+                break
+            if path is None:
+                if best_path is None:
+                    best_push_count, best_pull_count = push_count, pull_count
+                previous_keys = None
+                continue
+
+            if best_path is None or len(path) < len(best_path):
+                best_path, best_push_count, best_pull_count = path, push_count, pull_count
+
+            # the path converged, the next trials would follow it again
+            keys = [state.zobrist for state in path]
+            if keys == previous_keys:
+                break
+            previous_keys = keys
+
+        return best_path, best_push_count, best_pull_count
+
+    @staticmethod
+    def lookahead_cost(state: State, heuristic: Callable[[State], int], cost: MutableMapping[int, float], expand: Callable[[State], List[State]], depth: int, deadline: float, budget: Budget, is_solved: Callable[[State], bool] = State.is_solved) -> float:
+        """
+        Estimated cost of the state, searching depth moves ahead: the lowest number of moves to a state
+        of the search frontier plus the cost of that state (learned, or its heuristic).
+        The estimate never drops below the cost already learned for the state, the frontier states
+        are seldom visited and their heuristic alone would keep the agent going around in circles.
+        Raises DecisionTimeout when the deadline passes or the budget runs out.
         """
-        start_time = time.time()
-        maximum_time = 30
-        current_time = 0
-        current_map = initial_map
-        cost = {}  # heuristic values for visited states
+        value = cost.get(state.zobrist)
+        if value is None:
+            value = heuristic(state)
+        if depth == 0 or is_solved(state):
+            return value
+
+        if time.time() > deadline or budget.exceeded():
+            raise DecisionTimeout()
+        best_cost = float('inf')
+        for neighbor in expand(state):
+            best_cost = min(best_cost, 1 + LRTA_star.lookahead_cost(neighbor, heuristic, cost, expand, depth - 1, deadline, budget, is_solved))
+        return max(value, best_cost)
+
+    @staticmethod
+    def trial(start_state: State, heuristic: Callable[[State], int], cost: MutableMapping[int, float], expand: Callable[[State], List[State]], lookahead: int, move_time_budget: Optional[float], budget: Budget, is_solved: Callable[[State], bool] = State.is_solved) -> Tuple[List[State], int, int]:
+        """
+        One trial of LRTA*, from the start state until the goal, a dead end or the end of the budget.
+        The costs learned on the way are written to cost.
+        When the budget runs out, returns the path up to the best state of the trial, scored with the learned costs.
+        """
+        current_map = start_state
         path = [current_map]  # path to win
         push_count = 0
         pull_count = 0
+        best_score, best_length = None, 1
+
+        while not is_solved(current_map):
+            # states are keyed by their Zobrist hash
+            current_key = current_map.zobrist
 
-        while not current_map.is_solved():
-            # check time
-            current_time = time.time() - start_time
-            if current_time > maximum_time:
-                return None, push_count, pull_count
             # if the current state is not in visited, calculate its heuristic
-            if str(current_map) not in cost:
-                cost[str(current_map)] = heuristic(current_map)
+            if current_key not in cost:
+                cost[current_key] = heuristic(current_map)
+
+            # keep the most advanced state of the trial
+            if best_score is None or cost[current_key] <= best_score[0]:
+                score = progress(current_map, cost[current_key])
+                if best_score is None or score < best_score:
+                    best_score, best_length = score, len(path)
+                    if budget.best_h is None or best_score[0] < budget.best_h:
+                        budget.best_h = best_score[0]
+
+            # stop when the budget runs out
+            if budget.exceeded():
+                path = path[:best_length]
+                return path, sum(step.push_count for step in path), sum(step.pull_count for step in path)
 
             # get all neighbors of the current state
-            neighbors = current_map.get_neighbours()
+            neighbors = expand(current_map)
+            budget.frontier = len(neighbors)
 
-            # if no neighbors exist, return failure
+            # if no neighbors exist, return failure, the next trials avoid the dead end
             if not neighbors:
+                cost[current_key] = float('inf')
                 return None, push_count, pull_count
 
             # find the neighbor with the lowest heuristic value
             best_neighbor = None
             best_cost = float('inf')
             for neighbor in neighbors:
-                neighbor_str = str(neighbor)
-                new_cost = cost.get(neighbor_str, heuristic(neighbor))
+                # the heuristic is computed only for neighbours that were never visited
+                new_cost = cost.get(neighbor.zobrist)
+                if new_cost is None:
+                    new_cost = heuristic(neighbor)
                 if new_cost < best_cost:
                     best_cost = new_cost
                     best_neighbor = neighbor
 
+            # look further ahead while the time budget of the decision lasts
+            decision_deadline = budget.deadline
+            if move_time_budget is not None:
+                decision_deadline = min(decision_deadline, time.time() + move_time_budget)
+            for depth in range(1, lookahead):
+                try:
+                    costs = [LRTA_star.lookahead_cost(neighbor, heuristic, cost, expand, depth, decision_deadline, budget, is_solved) for neighbor in neighbors]
+                except DecisionTimeout:
+                    break  # commit to the best move of the last finished search
+                best_cost = min(costs)
+                best_neighbor = neighbors[costs.index(best_cost)]
+
+            # every neighbour is a dead end, so is the current state
+            if best_cost == float('inf'):
+                cost[current_key] = float('inf')
+                return None, push_count, pull_count
+
             # when go from state A to state B, the cost of A is the cost of B + 1
             # Update the heuristic value of the current state
-            cost[str(current_map)] = best_cost + 1 # algorithm "learns"
+            cost[current_key] = best_cost + 1 # algorithm "learns"
 
             # move to the best neighbor
             current_map = best_neighbor
@@ -60,4 +194,3 @@ class LRTA_star:
             pull_count += current_map.pull_count
 
         return path, push_count, pull_count
-
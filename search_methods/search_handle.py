@@ -0,0 +1,68 @@
+import asyncio
+from typing import AsyncIterator, Callable, List, Optional, Tuple
+from sokoban.state import State
+from search_methods.budget import Budget, ProgressEvent, CANCELLED
+from search_methods.search_stats import SearchStats
+
+
+class SearchHandle:
+    """
+    Handle of a search running in a worker thread, returned by Solver.solve_async.
+    Awaiting the handle returns the result of Solver.search, events yields the progress of the search,
+    and cancel stops it: the search returns its best partial path, as if it ran out of budget.
+    The awaiting task can also be cancelled, the search is then cancelled with it.
+
+    Attributes:
+    budget: budget of the search, it carries the cancellation and the progress events to the worker thread
+    """
+    def __init__(self, search: Callable[[Budget], Tuple], budget: Budget):
+        self.budget = budget
+        loop = asyncio.get_running_loop()
+        self._events = asyncio.Queue()
+
+        # the budget calls progress from the worker thread, the events are queued in the thread of the loop
+        budget.progress = lambda event: loop.call_soon_threadsafe(self._events.put_nowait, event)
+        self._future = loop.run_in_executor(None, search, budget)
+        self._future.add_done_callback(lambda _: self._events.put_nowait(None))
+
+    def cancel(self) -> None:
+        """
+        Stops the search at its next budget check, awaiting the handle returns its best partial path.
+        """
+        self.budget.cancel()
+
+    def cancelled(self) -> bool:
+        """
+        Returns True if the search was cancelled.
+        """
+        return self.budget.reason == CANCELLED
+
+    def done(self) -> bool:
+        """
+        Returns True when the search has finished.
+        """
+        return self._future.done()
+
+    async def events(self) -> AsyncIterator[ProgressEvent]:
+        """
+        Yields the progress events of the search until it finishes.
+        """
+        while True:
+            event = await self._events.get()
+            if event is None:
+                return
+            yield event
+
+    async def result(self) -> Tuple[List[State], int, int, float, Optional[SearchStats]]:
+        """
+        Waits for the end of the search and returns its result (see Solver.search).
+        """
+        try:
+            return await asyncio.shield(self._future)
+        except asyncio.CancelledError:
+            # the task waiting for the search is cancelled, the search isn't needed anymore
+            self.cancel()
+            raise
+
+    def __await__(self):
+        return self.result().__await__()
@@ -0,0 +1,106 @@
+import time
+from typing import Callable, Dict
+
+
+class PhaseStats:
+    """
+    Time and calls of one phase of a search.
+
+    Attributes:
+    calls: number of calls
+    time: total time of the calls, in seconds
+    results: total number of items returned by the calls, for the phases returning lists (move generation)
+    """
+    __slots__ = ('calls', 'time', 'results')
+
+    def __init__(self):
+        self.calls = 0
+        self.time = 0.0
+        self.results = 0
+
+
+class SearchStats:
+    """
+    Per-phase instrumentation of a search: time and calls of move generation, heuristic,
+    duplicate checks and goal tests. An engine given a SearchStats wraps its hot-path functions
+    and tables with timed versions (see timed and timed_lookups), an engine given None uses them as they are,
+    so the instrumentation costs nothing when it is disabled.
+    States are built and their Zobrist hash is updated while the moves are generated,
+    so copying and hashing are part of move generation.
+
+    Attributes:
+    phases: PhaseStats of every phase, by name
+    """
+    MOVE_GENERATION = 'move_generation'
+    HEURISTIC = 'heuristic'
+    DUPLICATE_CHECK = 'duplicate_check'
+    GOAL_TEST = 'goal_test'
+
+    def __init__(self):
+        self.phases = {}
+
+    def phase(self, name: str) -> PhaseStats:
+        """
+        Returns the stats of the phase, created on first use.
+        """
+        if name not in self.phases:
+            self.phases[name] = PhaseStats()
+        return self.phases[name]
+
+    def timed(self, name: str, function: Callable) -> Callable:
+        """
+        Returns the function, with its calls and time added to the phase.
+        Lists returned by the function add their length to the results of the phase.
+        """
+        phase = self.phase(name)
+        perf_counter = time.perf_counter
+
+        def timed_function(*args, **kwargs):
+            start = perf_counter()
+            result = function(*args, **kwargs)
+            phase.time += perf_counter() - start
+            phase.calls += 1
+            if type(result) is list:
+                phase.results += len(result)
+            return result
+        return timed_function
+
+    def timed_lookups(self, name: str, table):
+        """
+        Returns a copy of the set or dictionary whose lookups (in and get) are added to the phase.
+        """
+        phase = self.phase(name)
+        perf_counter = time.perf_counter
+        base = type(table)
+
+        class TimedTable(base):
+            def __contains__(self, key):
+                start = perf_counter()
+                found = base.__contains__(self, key)
+                phase.time += perf_counter() - start
+                phase.calls += 1
+                return found
+
+            if hasattr(base, 'get'):
+                def get(self, key, default=None):
+                    start = perf_counter()
+                    value = base.get(self, key, default)
+                    phase.time += perf_counter() - start
+                    phase.calls += 1
+                    return value
+
+        return TimedTable(table)
+
+    def as_dict(self) -> Dict[str, Dict]:
+        """
+        Returns the stats as plain dictionaries, by phase.
+        """
+        return {name: {'calls': phase.calls, 'time': phase.time, 'results': phase.results} for name, phase in self.phases.items()}
+
+    def __str__(self):
+        ''' Overriding toString method for SearchStats class'''
+        lines = [f"{'phase':16} {'calls':>10} {'time (s)':>10} {'us/call':>9} {'results':>10}"]
+        for name, phase in sorted(self.phases.items(), key=lambda item: -item[1].time):
+            per_call = phase.time / phase.calls * 1e6 if phase.calls else 0
+            lines.append(f"{name:16} {phase.calls:>10} {phase.time:>10.3f} {per_call:>9.2f} {phase.results:>10}")
+        return '\n'.join(lines)
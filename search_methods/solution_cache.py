@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import struct
+import tempfile
+from typing import Dict, List, Optional, Tuple
+from sokoban.map import Map
+from sokoban.state import State
+
+# File layout: header, then the number of moves of every step of the path (omitted when every step is one move),
+# then the moves, two per byte (moves are 1 to 8)
+HEADER = struct.Struct('<4sBIIII')  # magic, version, steps, moves, pushes, pulls
+MAGIC = b'SOKC'
+VERSION = 1
+EXTENSION = '.sol'
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+
+def pack_moves(moves: List[int]) -> bytes:
+    """
+    Packs the moves two per byte, the first one in the low 4 bits.
+    """
+    if len(moves) % 2:
+        moves = moves + [0]
+    return bytes(moves[index] | moves[index + 1] << 4 for index in range(0, len(moves), 2))
+
+def unpack_moves(data: bytes, count: int) -> List[int]:
+    """
+    Unpacks count moves packed by pack_moves.
+    """
+    moves = []
+    for byte in data:
+        moves.append(byte & 15)
+        moves.append(byte >> 4)
+    return moves[:count]
+
+
+class SolutionCache:
+    """
+    Cache of the solutions found by the searches, in a directory with one file per solution.
+    A solution is keyed by a hash of the level (size, walls, targets, boxes and player), the algorithm,
+    the heuristic and the options that change the solution, the file holds its moves,
+    4 bits each. A cached solution is replayed with Map.apply_move before it is returned, a solution
+    that doesn't solve its level anymore is dropped.
+    Files are written to a temporary file and renamed, so concurrent processes can share the directory:
+    readers never see a partial file, and writers of the same key write the same solution.
+    When the files take more than max_size bytes, the least recently used ones are removed,
+    a hit marks its file as used with its modification time.
+
+    Attributes:
+    directory: directory of the files
+    max_size: maximum total size of the files, in bytes
+    hits: number of solutions found in the cache
+    misses: number of solutions not found
+    """
+    def __init__(self, directory: str, max_size: int = DEFAULT_MAX_SIZE):
+        if max_size <= 0:
+            raise ValueError(f"max_size must be positive: {max_size}")
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(map: Map, algorithm: str, heuristic: str, options: Dict) -> str:
+        """
+        Returns the key of the solution of the map: a hex digest of the level, the boxes, the player,
+        the algorithm, the heuristic and the options, which must be the ones that change the solution.
+        """
+        state = State.from_map(map)
+        content = repr((map.level.fingerprint, state.boxes, state.player, algorithm, heuristic, json.dumps(options, sort_keys=True, default=repr)))
+        return hashlib.blake2b(content.encode(), digest_size=16).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + EXTENSION)
+
+    def get(self, key: str, map: Map) -> Optional[Tuple[List[State], int, int]]:
+        """
+        Returns the cached path of the map, with its pushes and pulls, None if it isn't cached or doesn't solve the map.
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        solution = self._decode(data, map)
+        if solution is None:
+            # a file of another version, or a solution of another level with the same key
+            self._remove(path)
+            self.misses += 1
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass  # evicted by another process meanwhile
+        self.hits += 1
+        return solution
+
+    def _decode(self, data: bytes, map: Map) -> Optional[Tuple[List[State], int, int]]:
+        """
+        Rebuilds the path of a file and checks it solves the map, returns None if the file is invalid.
+        """
+        if len(data) < HEADER.size:
+            return None
+        magic, version, steps, move_count, push_count, pull_count = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            return None
+        offset = HEADER.size
+        if steps == move_count:
+            step_lengths = [1] * steps
+        else:
+            if len(data) < offset + steps * 2:
+                return None
+            step_lengths = list(struct.unpack_from(f'<{steps}H', data, offset))
+            offset += steps * 2
+        moves = unpack_moves(data[offset:], move_count)
+        if len(moves) != move_count or sum(step_lengths) != move_count:
+            return None
+
+        # replay the moves on the map, they must solve it
+        replay = map.copy()
+        try:
+            for move in moves:
+                replay.apply_move(move)
+        except ValueError:
+            return None
+        if not replay.is_solved():
+            return None
+
+        state = State.from_map(map)
+        path = [state]
+        index = 0
+        for length in step_lengths:
+            step_push_count = step_pull_count = 0
+            for move in moves[index:index + length]:
+                state = state.apply_move(move)
+                step_push_count += state.push_count
+                step_pull_count += state.pull_count
+            path.append(State(state.level, state.player, state.boxes, step_push_count, step_pull_count, state.zobrist, state.moved_box, tuple(moves[index:index + length])))
+            index += length
+        return path, push_count, pull_count
+
+    def put(self, key: str, path: List[State], push_count: int, pull_count: int) -> None:
+        """
+        Stores the path of a solution, then evicts the least recently used files over max_size.
+        """
+        step_lengths = [len(state.moves) for state in path[1:]]
+        moves = [move for state in path[1:] for move in state.moves]
+        data = HEADER.pack(MAGIC, VERSION, len(step_lengths), len(moves), push_count, pull_count)
+        if len(step_lengths) != len(moves):
+            data += struct.pack(f'<{len(step_lengths)}H', *step_lengths)
+        data += pack_moves(moves)
+
+        descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                file.write(data)
+            os.replace(temporary_path, self._path(key))
+        except BaseException:
+            self._remove(temporary_path)
+            raise
+        self._evict()
+
+    def _evict(self) -> None:
+        """
+        Removes the least recently used files until the files take at most max_size bytes.
+        """
+        entries = []
+        total_size = 0
+        with os.scandir(self.directory) as scanner:
+            for entry in scanner:
+                if not entry.name.endswith(EXTENSION):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            self._remove(path)
+            total_size -= size
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass  # removed by another process
+
+    def __str__(self):
+        ''' Overriding toString method for SolutionCache class'''
+        return f"SolutionCache({self.directory}: {self.hits} hits, {self.misses} misses)"
@@ -1,47 +1,175 @@
 import os
 from sokoban.map import Map
-from typing import List, Tuple
-from search_methods.heuristics import Heuristic
+from sokoban.state import State, SUCCESSOR_GENERATORS
+from typing import List, Optional, Tuple, Union
+from search_methods.heuristics import Heuristic, CachedHeuristic
 from search_methods.lrta_star import LRTA_star
-from search_methods.beam_search import beam_search
+from search_methods.cost_table import CostTable
+from search_methods.a_star import A_star
+from search_methods.ida_star import IDA_star
+from search_methods.beam_search import beam_search, SELECTION_POLICIES
+from search_methods.bidirectional_search import bidirectional_search
+from search_methods.search_stats import SearchStats
+from search_methods.budget import Budget
+from search_methods.search_handle import SearchHandle
+from search_methods.solution_cache import SolutionCache
 
 
 class Solver:
-    def run_search_algorithm(self, algorithm: str, heuristic: str, map_name: str, generate_gif: bool = False) -> Tuple[int, float]:
+    def run_search_algorithm(self, algorithm: str, heuristic: str, map_name: str, generate_gif: bool = False, **options) -> Tuple[int, float]:
         """
         Run the search algorithm with the given heuristic and map name.
+        options are passed to search, with profile the time of every phase of the search is printed.
         Returns the number of nodes visited and the time taken.
         """
+        return self.report(algorithm, map_name, *self.search(algorithm, heuristic, map_name, **options))
+
+    def solve_async(self, algorithm: str, heuristic: str, map_name: str, maximum_time: Optional[float] = None, max_nodes: Optional[int] = None, max_memory: Optional[float] = None, **options) -> SearchHandle:
+        """
+        Starts the search in a worker thread and returns its SearchHandle, without waiting for it.
+        Must be called from a running asyncio event loop. Awaiting the handle returns the result of search,
+        its events are the progress of the search, and cancelling it stops the search.
+        The budget and the other options are the ones of search.
+        """
+        budget = Solver.default_budget(algorithm, maximum_time, max_nodes, max_memory)
+        return SearchHandle(lambda budget: self.search(algorithm, heuristic, map_name, budget=budget, **options), budget)
+
+    def report(self, algorithm: str, map_name: str, path: Optional[List[State]], push_count: int, pull_count: int, time_taken: float, stats: Optional[SearchStats]) -> Tuple[int, float]:
+        """
+        Prints the result of a search and returns the number of nodes visited (0 without a solution) and the time taken.
+        """
+        if stats is not None:
+            print(stats)
+        if path is None:
+            return 0, time_taken  # No path found
+        if not path[-1].is_solved():
+            print(f"{algorithm} stopped on {map_name} after {time_taken} seconds, best partial path: {len(path)} nodes, {path[-1].boxes_on_targets()} boxes on targets")
+            return 0, time_taken
+        count = len(path)
+        print(f"{algorithm} visited {count} nodes resolving {map_name} in {time_taken} seconds using pushes: {push_count} and pulls: {pull_count}")
+        
+        return count, time_taken
+
+    @staticmethod
+    def default_budget(algorithm: str, maximum_time: Optional[float] = None, max_nodes: Optional[int] = None, max_memory: Optional[float] = None) -> Budget:
+        """
+        Returns the budget of a search, by default it only limits the time,
+        to 30 seconds for LRTA* and 120 seconds for the other algorithms.
+        """
+        if maximum_time is None:
+            maximum_time = 30 if algorithm == 'LRTA_star' else 120
+        return Budget(maximum_time, max_nodes, max_memory)
+
+    def search(self, algorithm: str, heuristic: str, map_name: Union[str, Map], prune_dead_squares: bool = False, prune_deadlocks: bool = False, successors: str = 'moves', vectorized: bool = False, heuristic_cache_size: int = 0, seed: int = 0, workers: int = 1, expansion_workers: int = 1, beam_width: int = 50, selection: str = 'stochastic', trials: int = 1, cost_table_path: Optional[str] = None, lookahead: int = 1, move_time_budget: Optional[float] = None, maximum_time: Optional[float] = None, max_nodes: Optional[int] = None, max_memory: Optional[float] = None, budget: Optional[Budget] = None, profile: bool = False, solution_cache_path: Optional[str] = None) -> Tuple[List[State], int, int, float, Optional[SearchStats]]:
+        """
+        Run the search algorithm with the given heuristic and map name.
+        map_name is the path of the YAML file of the map, or the Map itself.
+        With prune_dead_squares, the algorithm doesn't push boxes on the dead squares of the map.
+        With prune_deadlocks, the algorithm discards states where the moved box is in a freeze deadlock,
+        it needs successors='pushes': with single moves, a frozen box can still be pulled out.
+        successors selects how states are expanded: 'moves' (one player move) or 'pushes' (walk and push a box).
+        With vectorized, Beam Search scores each beam with the NumPy version of the heuristic, when there is one.
+        With heuristic_cache_size, heuristic values are memoized in an LRU cache of that many entries.
+        seed fixes the random restarts of Beam Search, with workers > 1 the restarts run in parallel processes.
+        With expansion_workers > 1, Beam Search expands and scores each large beam in that many processes.
+        beam_width and selection set the size of the beam of Beam Search and how it is chosen among the successors:
+        'stochastic', 'top_k', 'without_replacement' or 'hybrid'.
+        trials is the number of LRTA* trials, with cost_table_path the costs it learns are kept in that file for the next runs
+        with the same heuristic, successors and pruning.
+        lookahead and move_time_budget (seconds per move) configure the decisions of LRTA*.
+        maximum_time (seconds), max_nodes (expanded nodes) and max_memory (resident MB) set the budget of the search
+        (see default_budget), or budget gives it, started when the search starts.
+        A search that runs out of budget returns the path to the best state it reached (see budget.progress):
+        the search solved the map only if the last state of the path is solved.
+        With profile, the search counts the calls and the time of its phases: move generation, heuristic,
+        duplicate checks and goal tests (see SearchStats). Without it, the search isn't slowed down.
+        With solution_cache_path, the solutions are kept in that directory (see SolutionCache): a search already
+        solved with the same map, algorithm, heuristic and options returns the cached path, replayed to check it.
+        Returns the path (None if no path was found), the pushes, the pulls, the time taken and the SearchStats (None without profile).
+        Raises ValueError for an unknown option, or a budget limit that isn't positive.
+        """
         heuristic_map = {
             'manhattan_heuristic': Heuristic.manhattan_heuristic,
             'euclidian_heuristic': Heuristic.euclidian_heuristic,
             'minimum_euclidian': Heuristic.minimum_euclidian,
             'minimum_manhattan': Heuristic.minimum_manhattan,
             'combined_heuristic': Heuristic.combined_heuristic,
+            'push_distance_heuristic': Heuristic.push_distance_heuristic,
+            'matching_heuristic': Heuristic.matching_heuristic,
         }
 
         if heuristic not in heuristic_map:
             raise ValueError(f"Unknown heuristic: {heuristic}")
 
         heuristic_function = heuristic_map[heuristic]
+        if heuristic_cache_size > 0:
+            heuristic_function = CachedHeuristic(heuristic_function, maxsize=heuristic_cache_size)
 
-        map = Map.from_yaml(map_name)
+        if successors not in SUCCESSOR_GENERATORS:
+            raise ValueError(f"Unknown successors: {successors}")
+
+        if selection not in SELECTION_POLICIES:
+            raise ValueError(f"Unknown selection: {selection}")
+
+        batch_heuristic_function = None
+        if vectorized:
+            from search_methods.batch_heuristics import BatchHeuristic
+            batch_heuristic_map = {
+                'manhattan_heuristic': BatchHeuristic.manhattan_heuristic,
+                'euclidian_heuristic': BatchHeuristic.euclidian_heuristic,
+                'combined_heuristic': BatchHeuristic.combined_heuristic,
+            }
+            batch_heuristic_function = batch_heuristic_map.get(heuristic)
+
+        map = map_name if isinstance(map_name, Map) else Map.from_yaml(map_name)
+        stats = SearchStats() if profile else None
+        if budget is None:
+            budget = Solver.default_budget(algorithm, maximum_time, max_nodes, max_memory)
         import time
         start_time = time.time()
+
+        solution_cache = None
+        if solution_cache_path is not None:
+            # the options that change the solution found
+            options = {'prune_dead_squares': prune_dead_squares, 'prune_deadlocks': prune_deadlocks, 'successors': successors, 'seed': seed, 'beam_width': beam_width, 'selection': selection, 'trials': trials, 'cost_table_path': cost_table_path, 'lookahead': lookahead, 'move_time_budget': move_time_budget}
+            solution_cache = SolutionCache(solution_cache_path)
+            cache_key = SolutionCache.key(map, algorithm, heuristic, options)
+            cached = solution_cache.get(cache_key, map)
+            if cached is not None:
+                path, push_count, pull_count = cached
+                print(solution_cache)
+                return path, push_count, pull_count, time.time() - start_time, stats
+
+        budget.start()
         if algorithm == 'LRTA_star':
-            path, push_count, pull_count = LRTA_star.LRTA_star(map, heuristic_function)
+            cost_table = CostTable(cost_table_path, map.level, heuristic, successors, prune_dead_squares, prune_deadlocks) if cost_table_path is not None else None
+            try:
+                path, push_count, pull_count = LRTA_star.LRTA_star(map, heuristic_function, prune_dead_squares=prune_dead_squares, prune_deadlocks=prune_deadlocks, successors=successors, trials=trials, cost_table=cost_table, lookahead=lookahead, move_time_budget=move_time_budget, budget=budget, stats=stats)
+            finally:
+                if cost_table is not None:
+                    print(cost_table)
+                    cost_table.close()
+        elif algorithm == 'A_star':
+            path, push_count, pull_count = A_star.A_star(map, heuristic_function, prune_dead_squares=prune_dead_squares, prune_deadlocks=prune_deadlocks, successors=successors, stats=stats, budget=budget)
+        elif algorithm == 'IDA_star':
+            path, push_count, pull_count = IDA_star.IDA_star(map, heuristic_function, prune_dead_squares=prune_dead_squares, prune_deadlocks=prune_deadlocks, successors=successors, stats=stats, budget=budget)
+        elif algorithm == 'Bidirectional_Search':
+            if successors != 'moves':
+                raise ValueError("Bidirectional search needs reversible successors: 'moves'")
+            path, push_count, pull_count = bidirectional_search(map, prune_dead_squares=prune_dead_squares, prune_deadlocks=prune_deadlocks, stats=stats, budget=budget)
         elif algorithm == 'Beam_Search':
-            path, push_count, pull_count = beam_search(map, 50, heuristic_function)
+            path, push_count, pull_count = beam_search(map, beam_width, heuristic_function, prune_dead_squares=prune_dead_squares, prune_deadlocks=prune_deadlocks, successors=successors, batch_heuristic=batch_heuristic_function, seed=seed, workers=workers, expansion_workers=expansion_workers, selection=selection, stats=stats, budget=budget)
         else:
             raise ValueError(f"Unknown algorithm: {algorithm}")
         end_time = time.time()
         time_taken = end_time - start_time
-        if path is None:
-            return 0, time_taken  # No path found
-        count = len(path)
-        print(f"{algorithm} visited {count} nodes resolving {map_name} in {time_taken} seconds using pushes: {push_count} and pulls: {pull_count}")
-        
-        return count, time_taken
+        if solution_cache is not None and path is not None and path[-1].is_solved():
+            solution_cache.put(cache_key, path, push_count, pull_count)
+        if isinstance(heuristic_function, CachedHeuristic):
+            print(heuristic_function)
+        if budget.reason is not None:
+            print(budget)
+        return path, push_count, pull_count, time_taken, stats
     
     def plot_multiple_alg_one_heuristic(self, algorithms: List[str], heuristic: str, num_nudes_visited: List[int], time_taken: List[float], map_name: str):
         """
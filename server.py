@@ -0,0 +1,183 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import socketserver
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from typing import Callable, Dict, Iterable
+
+from sokoban.map import Map
+from sokoban.moves import moves_meaning
+from search_methods.solver import Solver
+
+TESTS_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests')
+
+# Solver of a worker process, created once by init_worker
+_solver = None
+
+
+def init_worker() -> None:
+    """
+    Initializer of the worker processes: the modules are imported and the solver created once,
+    so the jobs of a warm worker start without any import.
+    """
+    global _solver
+    _solver = Solver()
+
+def load_map(request: Dict) -> Map:
+    """
+    Returns the map of a request, given by exactly one of:
+    'level' (the text format of Map.from_str), 'yaml' (the content of a YAML map file)
+    or 'map' (the path of a YAML map file, or the name of a map of the tests directory).
+    """
+    sources = [key for key in ('level', 'yaml', 'map') if key in request]
+    if len(sources) != 1:
+        raise ValueError("A request needs exactly one of 'level', 'yaml' and 'map'")
+    if 'level' in request:
+        return Map.from_str(request['level'])
+    if 'yaml' in request:
+        return Map.from_yaml_str(request['yaml'])
+    path = request['map']
+    if not os.path.exists(path):
+        path = os.path.join(TESTS_DIRECTORY, f'{path}.yaml')
+    return Map.from_yaml(path)
+
+def solve(request: Dict) -> Dict:
+    """
+    Solves one request in a worker process and returns its response.
+    The request holds the map (see load_map), 'algorithm', 'heuristic' and the 'options' of Solver.search,
+    the response its 'id', the 'status' (solved, partial, failed or error), the 'moves' of the path
+    and the counts of the search. The output of the solver is discarded.
+    """
+    response = {'id': request.get('id')}
+    try:
+        map = load_map(request)
+        with contextlib.redirect_stdout(io.StringIO()):
+            path, push_count, pull_count, time_taken, _ = _solver.search(request['algorithm'], request.get('heuristic', 'manhattan_heuristic'), map, **request.get('options', {}))
+        if path is None:
+            response.update({'status': 'failed', 'time': time_taken})
+            return response
+        moves = [moves_meaning[move] for state in path for move in state.moves]
+        response.update({
+            'status': 'solved' if path[-1].is_solved() else 'partial',
+            'time': time_taken,
+            'moves': moves,
+            'solution_length': len(moves),
+            'pushes': push_count,
+            'pulls': pull_count,
+            'boxes_on_targets': path[-1].boxes_on_targets(),
+        })
+    except Exception as error:
+        response.update({'status': 'error', 'error': repr(error)})
+    return response
+
+def serve(lines: Iterable[str], write: Callable[[Dict], None], pool: ProcessPoolExecutor) -> None:
+    """
+    Sends every JSON line of a client to the pool and writes the responses as the jobs finish,
+    so they can come back in another order than the requests (their 'id' tells them apart).
+    Returns when the client closed its input and the response of every job is written.
+    The responses are written by the done callbacks of the jobs, which run after the waiters
+    of the futures wake up, so the callbacks are counted instead of waiting for the futures.
+    """
+    unwritten = 0
+    written = threading.Condition()
+
+    def respond_and_count(future, request: Dict) -> None:
+        nonlocal unwritten
+        try:
+            respond(future, request, write)
+        finally:
+            with written:
+                unwritten -= 1
+                written.notify_all()
+
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("A request must be a JSON object")
+        except ValueError as error:
+            write({'id': None, 'status': 'error', 'error': repr(error)})
+            continue
+        future = pool.submit(solve, request)
+        with written:
+            unwritten += 1
+        future.add_done_callback(lambda future, request=request: respond_and_count(future, request))
+    with written:
+        written.wait_for(lambda: unwritten == 0)
+
+def respond(future, request: Dict, write: Callable[[Dict], None]) -> None:
+    """
+    Writes the response of a finished job, an error response if its worker process died.
+    """
+    error = future.exception()
+    if error is not None:
+        write({'id': request.get('id'), 'status': 'error', 'error': repr(error)})
+    else:
+        write(future.result())
+
+def line_writer(stream) -> Callable[[Dict], None]:
+    """
+    Returns a function writing a response as one JSON line on the stream, from any thread.
+    """
+    lock = threading.Lock()
+
+    def write(response: Dict) -> None:
+        line = json.dumps(response) + '\n'
+        with lock:
+            stream.write(line)
+            stream.flush()
+    return write
+
+class SolveServer(socketserver.ThreadingTCPServer):
+    """
+    TCP server of the requests, every connection is served by serve in its own thread.
+
+    Attributes:
+    pool: pool of the worker processes solving the requests
+    """
+    def __init__(self, address, pool: ProcessPoolExecutor):
+        self.pool = pool
+        super().__init__(address, SolveHandler)
+
+
+class SolveHandler(socketserver.StreamRequestHandler):
+    """
+    Serves the JSON lines of one connection, the connection is closed once every response is written.
+    """
+    def handle(self):
+        stream = io.TextIOWrapper(self.wfile, encoding='utf-8', write_through=True)
+        serve(io.TextIOWrapper(self.rfile, encoding='utf-8'), line_writer(stream), self.server.pool)
+        stream.detach()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Solve Sokoban levels sent as JSON lines, with a pool of warm worker processes. '
+                                                 'Reads the requests from stdin and writes the responses to stdout, or serves them on a local TCP port.')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('--port', type=int, help='serve on this port of 127.0.0.1 instead of stdin and stdout, one JSON line per request')
+    arguments = parser.parse_args()
+
+    with ProcessPoolExecutor(max_workers=arguments.workers, initializer=init_worker) as pool:
+        # start the workers now, the first requests don't wait for them
+        wait([pool.submit(int) for _ in range(arguments.workers)])
+
+        if arguments.port is None:
+            serve(sys.stdin, line_writer(sys.stdout), pool)
+            return
+
+        with SolveServer(('127.0.0.1', arguments.port), pool) as server:
+            print(f'Serving on 127.0.0.1:{arguments.port}', file=sys.stderr)
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                pass
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,7 @@
 from .map import Map
+from .state import State
 
 from typing import List, Union
-import imageio
 import glob
 import os
 import re
@@ -9,7 +9,7 @@ import re
 __all__ = ['save_images', 'create_gif']
 
 
-def save_images(solution_steps: List[Union[str, Map]], save_path: str) -> None:
+def save_images(solution_steps: List[Union[str, Map, State]], save_path: str) -> None:
     for i, step in enumerate(solution_steps):
 
         if step is None:
@@ -17,6 +17,8 @@ def save_images(solution_steps: List[Union[str, Map]], save_path: str) -> None:
 
         if isinstance(step, str):
             state = Map.from_str(step)
+        elif isinstance(step, State):
+            state = step.to_map()
         else:
             state = step
             
@@ -39,6 +41,8 @@ def create_gif(path_images, gif_name, save_path):
     if os.path.exists(f'{save_path}/{gif_name}'):
         os.remove(f'{save_path}/{gif_name}')
 
+    # imported on first use, only the GIFs need it
+    import imageio
     imageio.plugins.freeimage.download()
 
     images = []
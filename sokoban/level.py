@@ -0,0 +1,149 @@
+from .moves import *
+
+from array import array
+from collections import deque
+import hashlib
+import math
+import random
+
+
+__all__ = ['Level', 'UNREACHABLE']
+
+
+# Distance of the cells from which a target can't be reached, larger than any real distance
+UNREACHABLE = 2 ** 20
+
+
+# Fixed seed, so the Zobrist keys of a level are the same in every process and every run
+ZOBRIST_SEED = 0x5EED
+
+
+class Level:
+    '''
+    Level Class records the static part of the board: its size, the obstacles and the targets.
+    A level is built once when a map is loaded and shared by every map and state of a search.
+    Cells are flat indices (x * width + y).
+
+    Attributes:
+    length: length of the map
+    width: width of the map
+    cells: number of cells of the map
+    obstacles: list of obstacles given as tuples for positions on the map
+    targets: list of targets given as tuples for positions on the map
+    obstacle_positions: set of the obstacle positions, for O(1) lookups
+    target_positions: set of the target positions, for O(1) lookups
+    walls: walls[cell] is 1 if the cell is an obstacle, 0 otherwise
+    target_cells: set of the target cells
+    neighbours: neighbours[cell][move - 1] is the cell reached from cell with the plain move,
+                -1 if it is outside the map or an obstacle
+    zobrist_player: random 64-bit key of the player standing on each cell
+    zobrist_boxes: random 64-bit key of a box standing on each cell
+    push_distances: push_distances[index * cells + cell] is the number of pushes that move a box from cell
+                    to targets[index] when no other box is in the way, UNREACHABLE if it can't be done
+    min_push_distances: min_push_distances[cell] is the number of pushes to the closest target
+    manhattan_sums: manhattan_sums[cell] is the sum of the Manhattan distances from cell to every target
+    euclidian_sums: euclidian_sums[cell] is the sum of the Euclidean distances from cell to every target
+    dead_squares: dead_squares[cell] is 1 if a box pushed on the cell can never be pushed to a target
+    test_name: name of the test the level was loaded from
+    fingerprint: hex digest of the size, obstacles and targets, the same for every copy of the level
+    '''
+    def __init__(self, length, width, targets, obstacles, test_name='test'):
+        self.length = length
+        self.width = width
+        self.cells = length * width
+        self.test_name = test_name
+
+        self.obstacles = [(x, y) for x, y in obstacles]
+        self.targets = [(x, y) for x, y in targets]
+        self.obstacle_positions = frozenset(self.obstacles)
+        self.target_positions = frozenset(self.targets)
+        layout = repr((length, width, sorted(self.obstacles), sorted(self.targets)))
+        self.fingerprint = hashlib.blake2b(layout.encode(), digest_size=8).hexdigest()
+
+        walls = bytearray(self.cells)
+        for x, y in self.obstacles:
+            walls[self.cell(x, y)] = 1
+        self.walls = bytes(walls)
+
+        self.target_cells = frozenset(self.cell(x, y) for x, y in self.targets)
+
+        neighbours = []
+        for cell in range(self.cells):
+            x, y = self.position(cell)
+            cell_neighbours = []
+            for move in (LEFT, RIGHT, UP, DOWN):
+                dx, dy = move_deltas[move]
+                next_x, next_y = x + dx, y + dy
+                if 0 <= next_x < length and 0 <= next_y < width and not walls[next_x * width + next_y]:
+                    cell_neighbours.append(next_x * width + next_y)
+                else:
+                    cell_neighbours.append(-1)
+            neighbours.append(tuple(cell_neighbours))
+        self.neighbours = tuple(neighbours)
+
+        generator = random.Random(ZOBRIST_SEED)
+        self.zobrist_player = tuple(generator.getrandbits(64) for _ in range(self.cells))
+        self.zobrist_boxes = tuple(generator.getrandbits(64) for _ in range(self.cells))
+
+        # Distance tables, one block of cells entries for each target, in the order of targets
+        target_cells = [self.cell(x, y) for x, y in self.targets]
+        self.push_distances = array('i')
+        for target in target_cells:
+            self.push_distances.extend(self._push_distances_to(target))
+
+        self.min_push_distances = array('i', [UNREACHABLE]) * self.cells
+        self.manhattan_sums = array('i', [0]) * self.cells
+        self.euclidian_sums = array('d', [0.0]) * self.cells
+        for cell in range(self.cells):
+            x, y = self.position(cell)
+            for index, (target_x, target_y) in enumerate(self.targets):
+                self.min_push_distances[cell] = min(self.min_push_distances[cell], self.push_distances[index * self.cells + cell])
+                self.manhattan_sums[cell] += abs(x - target_x) + abs(y - target_y)
+                self.euclidian_sums[cell] += math.sqrt((x - target_x)**2 + (y - target_y)**2)
+
+        # A floor cell from which no target can be reached by pushes is a dead square
+        self.dead_squares = bytes(1 if self.min_push_distances[cell] == UNREACHABLE and not self.walls[cell] else 0 for cell in range(self.cells))
+
+    def cell(self, x, y):
+        ''' Returns the cell of the (x, y) position'''
+        return x * self.width + y
+
+    def position(self, cell):
+        ''' Returns the (x, y) position of the cell'''
+        return divmod(cell, self.width)
+
+    def _push_distances_to(self, target):
+        '''
+        Returns the number of pushes needed to move a box from every cell to the target, ignoring the other boxes.
+        Boxes are pulled backwards from the target, a box pulled from cell to previous
+        needs the player to stand one more step behind, on the cell after previous.
+        Cells that no pull reaches get UNREACHABLE.
+        '''
+        neighbours = self.neighbours
+        distances = array('i', [UNREACHABLE]) * self.cells
+        distances[target] = 0
+        queue = deque([target])
+
+        while queue:
+            cell = queue.popleft()
+            for move in (LEFT, RIGHT, UP, DOWN):
+                previous = neighbours[cell][move - 1]
+                if previous < 0 or distances[previous] != UNREACHABLE:
+                    continue
+                if neighbours[previous][move - 1] < 0:
+                    continue
+                distances[previous] = distances[cell] + 1
+                queue.append(previous)
+
+        return distances
+
+    def zobrist_hash(self, player, boxes):
+        ''' Returns the Zobrist hash of the player cell and the box cells, computed from scratch'''
+        value = self.zobrist_player[player]
+        for box in boxes:
+            value ^= self.zobrist_boxes[box]
+        return value
+
+    def __str__(self):
+        ''' Overriding toString method for Level class'''
+        return f'Level {self.test_name}: {self.length}x{self.width}, {len(self.targets)} targets, {len(self.obstacles)} obstacles'
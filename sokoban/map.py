@@ -1,8 +1,8 @@
 from .player import Player
 from .box import Box
+from .level import Level
 from .moves import *
 
-from matplotlib import pyplot as plt
 from typing import Optional
 import yaml
 import os
@@ -23,17 +23,23 @@ class Map:
     width: width of the map
     player: player object, positioned on the map
     boxes: list of box objects, positioned on the map
+    level: static part of the map (size, obstacles, targets), shared between copies
     obstacles: list of obstacles given as tuples for positions on the map
     targets: list of target objects, positioned on the map
     map: 2D matrix representing the map
     explored_states: number of explored states
     undo_moves: number of undo moves made // e.g. _ P B => P B _
     '''
-    def __init__(self, length, width, player_x, player_y, boxes, targets, obstacles, test_name='test'):
+    def __init__(self, length, width, player_x, player_y, boxes, targets, obstacles, test_name='test', level=None):
+        if level is None:
+            level = Level(length, width, targets, obstacles, test_name)
+
+        self.level = level
         self.length = length
         self.width = width
         self.map = [[0 for _ in range(width)] for _ in range(length)]
-        self.obstacles = obstacles
+        self.obstacles = level.obstacles
+        self.targets = level.targets
         self.test_name = test_name
 
         self.explored_states = 0
@@ -42,6 +48,10 @@ class Map:
         for obstacle_x, obstacle_y in self.obstacles:
             self.map[obstacle_x][obstacle_y] = OBSTACLE_SYMBOL
 
+        # Targets are drawn before the boxes, so a box placed on a target is still seen as a box
+        for target_x, target_y in self.targets:
+            self.map[target_x][target_y] = TARGET_SYMBOL
+
         self.player = Player('player', 'P', player_x, player_y)
 
         self.boxes = {}
@@ -56,11 +66,6 @@ class Map:
 
             self.map[box_x][box_y] = BOX_SYMBOL
 
-        self.targets = []
-        for target_x, target_y in targets:
-            self.targets.append((target_x, target_y))
-            self.map[target_x][target_y] = TARGET_SYMBOL
-
         self.push_count = 0
         self.pull_count = 0
 
@@ -91,13 +96,21 @@ class Map:
                 elif cell == 'X':
                     targets.append((i, j))
 
-        return cls(length, width, player_x, player_y, boxes, targets, obstacles)
+        level = Level(length, width, targets, obstacles)
+        return cls(length, width, player_x, player_y, boxes, targets, obstacles, level=level)
 
 
     @classmethod
     def from_yaml(cls, path):
         with open(path, 'r') as file:
-            data = yaml.load(file, Loader=yaml.FullLoader)
+            return cls.from_yaml_str(file.read(), path.split('/')[-1].split('.')[0])
+
+    @classmethod
+    def from_yaml_str(cls, yaml_str, test_name='test'):
+        ''' Creates a map from the content of a YAML map file'''
+        data = yaml.load(yaml_str, Loader=yaml.FullLoader)
+
+        level = Level(data['height'], data['width'], data['targets'], data['walls'], test_name)
 
         return cls(
             length=data['height'], 
@@ -107,10 +120,31 @@ class Map:
             boxes=data['boxes'], 
             targets=data['targets'], 
             obstacles=data['walls'], 
-            test_name=path.split('/')[-1].split('.')[0]
+            test_name=test_name,
+            level=level
         )
     
 
+    @property
+    def player_position(self):
+        ''' Returns the (x, y) position of the player'''
+        return (self.player.x, self.player.y)
+
+    @property
+    def box_positions(self):
+        ''' Returns the (x, y) positions of the boxes'''
+        return [(box.x, box.y) for box in self.boxes.values()]
+
+    @property
+    def player_cell(self):
+        ''' Returns the cell of the player in the level'''
+        return self.level.cell(self.player.x, self.player.y)
+
+    @property
+    def box_cells(self):
+        ''' Returns the cells of the boxes in the level'''
+        return [self.level.cell(box.x, box.y) for box in self.boxes.values()]
+
     def object_in_bounds_move(self, checking_object, move):
         ''' Checks if the object moves inside the map'''
         if move == LEFT:
@@ -301,7 +335,7 @@ class Map:
 
     def copy(self):
         ''' Returns a copy of the current state'''
-        new_map = Map(self.length, self.width, self.player.x, self.player.y, [(box.name, box.x, box.y) for box in self.boxes.values()], self.targets, self.obstacles)
+        new_map = Map(self.length, self.width, self.player.x, self.player.y, [(box.name, box.x, box.y) for box in self.boxes.values()], self.targets, self.obstacles, self.test_name, level=self.level)
         new_map.map = [row.copy() for row in self.map]
         new_map.positions_of_boxes = self.positions_of_boxes.copy()
         new_map.explored_states = self.explored_states
@@ -352,6 +386,8 @@ class Map:
         save_path: Optional[str] = None, 
         save_name: Optional[str] = None
     ) -> None:
+        # imported on first use, matplotlib is slow to import and only needed to draw
+        from matplotlib import pyplot as plt
         fig, ax = plt.subplots()
         ax.imshow(self.map, cmap='viridis')
 
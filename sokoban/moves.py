@@ -1,7 +1,7 @@
 
 __all__ = ['LEFT', 'RIGHT', 'UP', 'DOWN', 
            'BOX_LEFT', 'BOX_RIGHT', 'BOX_UP', 'BOX_DOWN', 
-           'moves_meaning']
+           'moves_meaning', 'move_deltas', 'opposite_moves']
 
 # Moves
 LEFT = 1
@@ -24,3 +24,19 @@ moves_meaning = {
     BOX_UP:    'box_up',
     BOX_DOWN:  'box_down'
 }
+
+# Player displacement (dx, dy) for each of the plain moves
+move_deltas = {
+    LEFT:  (0, -1),
+    RIGHT: (0, 1),
+    UP:    (1, 0),
+    DOWN:  (-1, 0)
+}
+
+# Plain move in the opposite direction of each plain move
+opposite_moves = {
+    LEFT:  RIGHT,
+    RIGHT: LEFT,
+    UP:    DOWN,
+    DOWN:  UP
+}
@@ -0,0 +1,242 @@
+from .level import Level
+from .map import Map
+from .moves import *
+
+from collections import deque
+
+
+__all__ = ['State', 'SUCCESSOR_GENERATORS']
+
+
+class State:
+    '''
+    State Class records only the dynamic part of the board, the player and the boxes.
+    Cells are stored as flat indices (x * width + y), the static part of the board
+    is read from the level shared by every state of a search.
+    States are immutable and hashable, a Map view is built only when needed.
+
+    Attributes:
+    level: level (size, obstacles, targets) the state belongs to
+    player: cell of the player
+    boxes: sorted tuple with the cells of the boxes
+    push_count: 1 if the move that produced this state pushed a box, 0 otherwise
+    pull_count: 1 if the move that produced this state pulled a box, 0 otherwise
+    zobrist: 64-bit Zobrist hash of the state, updated incrementally by apply_move
+    moved_box: (from cell, to cell) of the box moved by the move that produced this state, None if no box moved
+    moves: moves that lead from the previous state to this one, a single move or a walk followed by a push
+    '''
+    __slots__ = ('level', 'player', 'boxes', 'push_count', 'pull_count', 'zobrist', 'moved_box', 'moves')
+
+    def __init__(self, level: Level, player, boxes, push_count=0, pull_count=0, zobrist=None, moved_box=None, moves=()):
+        self.level = level
+        self.player = player
+        self.boxes = boxes
+        self.push_count = push_count
+        self.pull_count = pull_count
+        self.moved_box = moved_box
+        self.moves = moves
+        if zobrist is None:
+            zobrist = level.zobrist_hash(player, boxes)
+        self.zobrist = zobrist
+
+    @classmethod
+    def from_map(cls, map: Map):
+        ''' Creates the state of the given map'''
+        level = map.level
+        boxes = tuple(sorted(level.cell(box.x, box.y) for box in map.boxes.values()))
+        return cls(level, level.cell(map.player.x, map.player.y), boxes)
+
+    def to_map(self) -> Map:
+        ''' Builds a Map view of the state'''
+        level = self.level
+        player_x, player_y = self.player_position
+        boxes = [(f"box{x}_{y}", x, y) for x, y in self.box_positions]
+        return Map(level.length, level.width, player_x, player_y, boxes, level.targets, level.obstacles, level.test_name, level=level)
+
+    @property
+    def player_position(self):
+        ''' Returns the (x, y) position of the player'''
+        return self.level.position(self.player)
+
+    @property
+    def box_positions(self):
+        ''' Returns the (x, y) positions of the boxes'''
+        width = self.level.width
+        return [divmod(cell, width) for cell in self.boxes]
+
+    @property
+    def player_cell(self):
+        ''' Returns the cell of the player'''
+        return self.player
+
+    @property
+    def box_cells(self):
+        ''' Returns the cells of the boxes'''
+        return self.boxes
+
+    @property
+    def targets(self):
+        return self.level.targets
+
+    @property
+    def obstacles(self):
+        return self.level.obstacles
+
+    def apply_move(self, move):
+        '''
+        Returns the state reached by applying the move, None if the move is invalid.
+        Moves follow the same rules as Map.apply_move: plain moves walk or push a box,
+        box moves push the box in front of the player or pull the box behind him.
+        '''
+        if move < BOX_LEFT:
+            implicit_move = move
+        elif move <= BOX_DOWN:
+            # Moves higher than 4 highlight the player carrying the box
+            implicit_move = move - 4
+        else:
+            raise ValueError('Apply Error: Got to make an invalid move')
+
+        level = self.level
+        neighbours = level.neighbours
+        boxes = self.boxes
+        future_position = neighbours[self.player][implicit_move - 1]
+        if future_position < 0:
+            return None
+
+        # The player always moves, the box that moves (if any) is xor-ed out of its cell and into the new one
+        zobrist = self.zobrist ^ level.zobrist_player[self.player] ^ level.zobrist_player[future_position]
+
+        if future_position in boxes:
+            # _ B P => B P _
+            box_future_position = neighbours[future_position][implicit_move - 1]
+            if box_future_position < 0 or box_future_position in boxes:
+                return None
+            new_boxes = tuple(sorted(box_future_position if box == future_position else box for box in boxes))
+            zobrist ^= level.zobrist_boxes[future_position] ^ level.zobrist_boxes[box_future_position]
+            return State(level, future_position, new_boxes, push_count=1, zobrist=zobrist, moved_box=(future_position, box_future_position), moves=(move,))
+
+        if move < BOX_LEFT:
+            return State(level, future_position, boxes, zobrist=zobrist, moves=(move,))
+
+        # _ P B => P B _
+        opposite_position = neighbours[self.player][opposite_moves[implicit_move] - 1]
+        if opposite_position < 0 or opposite_position not in boxes:
+            return None
+        new_boxes = tuple(sorted(self.player if box == opposite_position else box for box in boxes))
+        zobrist ^= level.zobrist_boxes[opposite_position] ^ level.zobrist_boxes[self.player]
+        return State(level, future_position, new_boxes, pull_count=1, zobrist=zobrist, moved_box=(opposite_position, self.player), moves=(move,))
+
+    def get_neighbours(self, prune_dead_squares=False):
+        '''
+        Returns the neighbours of the current state.
+        A box move that pushes is the same as the plain move, so it is not generated twice.
+        With prune_dead_squares, states where a box was just pushed on a dead square are left out.
+        '''
+        dead_squares = self.level.dead_squares
+        neighbours = []
+        for move in range(LEFT, BOX_DOWN + 1):
+            neighbour = self.apply_move(move)
+            if neighbour is None:
+                continue
+            if neighbour.push_count:
+                if move >= BOX_LEFT:
+                    continue
+                if prune_dead_squares and dead_squares[neighbour.moved_box[1]]:
+                    continue
+            neighbours.append(neighbour)
+        return neighbours
+
+    def reachable_cells(self):
+        '''
+        Flood-fills the cells the player can walk to without moving a box.
+        Returns a dictionary with each reachable cell as key and (previous cell, move) as value,
+        the player cell has None as value.
+        '''
+        neighbours = self.level.neighbours
+        boxes = self.boxes
+        reachable = {self.player: None}
+        queue = deque([self.player])
+        while queue:
+            cell = queue.popleft()
+            for move in (LEFT, RIGHT, UP, DOWN):
+                next_cell = neighbours[cell][move - 1]
+                if next_cell < 0 or next_cell in reachable or next_cell in boxes:
+                    continue
+                reachable[next_cell] = (cell, move)
+                queue.append(next_cell)
+        return reachable
+
+    @staticmethod
+    def walk_path(reachable, cell):
+        ''' Returns the moves that walk the player to the cell, using the result of reachable_cells'''
+        moves = []
+        while reachable[cell] is not None:
+            cell, move = reachable[cell]
+            moves.append(move)
+        moves.reverse()
+        return moves
+
+    def get_push_neighbours(self, prune_dead_squares=False):
+        '''
+        Returns one neighbour for every box push the player can make after walking on the free floor.
+        The walk and the push are stored in the moves of the neighbour, so the solution can be replayed.
+        Only pushes are generated, boxes are never pulled.
+        With prune_dead_squares, pushes of a box on a dead square are left out.
+        '''
+        level = self.level
+        neighbours = level.neighbours
+        boxes = self.boxes
+        reachable = self.reachable_cells()
+
+        # The player leaves its cell, the Zobrist key of the new cell is added for each push
+        zobrist = self.zobrist ^ level.zobrist_player[self.player]
+
+        push_neighbours = []
+        for box in boxes:
+            for move in (LEFT, RIGHT, UP, DOWN):
+                behind = neighbours[box][opposite_moves[move] - 1]
+                if behind < 0 or behind not in reachable:
+                    continue
+                ahead = neighbours[box][move - 1]
+                if ahead < 0 or ahead in boxes:
+                    continue
+                if prune_dead_squares and level.dead_squares[ahead]:
+                    continue
+
+                new_boxes = tuple(sorted(ahead if other == box else other for other in boxes))
+                new_zobrist = zobrist ^ level.zobrist_player[box] ^ level.zobrist_boxes[box] ^ level.zobrist_boxes[ahead]
+                moves = tuple(State.walk_path(reachable, behind)) + (move,)
+                push_neighbours.append(State(level, box, new_boxes, push_count=1, zobrist=new_zobrist, moved_box=(box, ahead), moves=moves))
+
+        return push_neighbours
+
+    def is_solved(self):
+        ''' Checks if all the boxes are on the targets'''
+        return self.level.target_cells.issubset(self.boxes)
+
+    def boxes_on_targets(self):
+        ''' Returns the number of boxes on a target'''
+        return len(self.level.target_cells.intersection(self.boxes))
+
+    def __eq__(self, other):
+        if not isinstance(other, State):
+            return NotImplemented
+        return self.player == other.player and self.boxes == other.boxes
+
+    def __hash__(self):
+        return self.zobrist
+
+    def __lt__(self, other):
+        return (self.boxes, self.player) < (other.boxes, other.player)
+
+    def __str__(self):
+        ''' Overriding toString method for State class'''
+        return str(self.to_map())
+
+
+# Successor generators the search engines can choose from:
+# 'moves' expands single player moves (walks, pushes and pulls), 'pushes' expands whole box pushes
+SUCCESSOR_GENERATORS = {
+    'moves': State.get_neighbours,
+    'pushes': State.get_push_neighbours,
+}
@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+from sokoban.level import Level
+from sokoban.map import Map
+from search_methods.a_star import A_star
+from search_methods.deadlocks import is_freeze_deadlock
+from search_methods.heuristics import Heuristic
+
+TESTS_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_box_frozen_only_against_a_movable_box():
+    # (2,1) is blocked by the wall below and by (2,2), which can still be pushed up,
+    # so the row of boxes isn't frozen although (2,2) was found frozen with (2,1) as a wall
+    level = Level(5, 7, [(2, 3), (2, 4), (0, 5), (0, 6)], [(3, 1), (3, 3), (3, 4)])
+    boxes = {level.cell(2, y) for y in (1, 2, 3, 4)}
+    for y in (1, 2, 3, 4):
+        assert not is_freeze_deadlock(level, boxes, level.cell(2, y))
+
+
+def test_boxes_frozen_together_off_target():
+    # two boxes against the top wall block each other, one of them is not on a target
+    level = Level(4, 4, [(0, 1), (3, 3)], [])
+    boxes = {level.cell(0, 1), level.cell(0, 2)}
+    assert is_freeze_deadlock(level, boxes, level.cell(0, 1))
+
+
+def test_deadlock_pruning_needs_pushes():
+    # with single moves, a frozen box can be pulled out
+    map = Map.from_yaml(os.path.join(TESTS_DIRECTORY, 'easy_map1.yaml'))
+    with pytest.raises(ValueError):
+        A_star.A_star(map, Heuristic.manhattan_heuristic, prune_deadlocks=True)
+    path, _, _ = A_star.A_star(map, Heuristic.manhattan_heuristic, prune_deadlocks=True, successors='pushes')
+    assert path[-1].is_solved()
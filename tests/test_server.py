@@ -0,0 +1,27 @@
+import json
+import socket
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from server import SolveServer, init_worker
+
+
+def test_tcp_response_arrives_before_close():
+    # every connection sends one request and closes its side, the response must come back before the server closes
+    with ProcessPoolExecutor(max_workers=1, initializer=init_worker) as pool:
+        with SolveServer(('127.0.0.1', 0), pool) as server:
+            thread = threading.Thread(target=server.serve_forever)
+            thread.start()
+            try:
+                for index in range(20):
+                    with socket.create_connection(server.server_address) as connection:
+                        request = {'id': index, 'map': 'easy_map1', 'algorithm': 'A_star'}
+                        connection.sendall((json.dumps(request) + '\n').encode())
+                        connection.shutdown(socket.SHUT_WR)
+                        reply = connection.makefile(encoding='utf-8').readline()
+                    response = json.loads(reply)
+                    assert response['id'] == index
+                    assert response['status'] == 'solved'
+            finally:
+                server.shutdown()
+                thread.join()